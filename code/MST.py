@@ -1,39 +1,90 @@
 from logProducer import alert_leaders_to_start_level, new_leaders_elected, new_links_added, nodes_dead
-import threading
+from workerPool import WorkerPool
+from messages import DISCOVER, BEACON_MESSAGE, DISCOVERY_BEACON_MESSAGE
+from Node import get_link_key
+import metrics
 import Queue
+import collections
 import math
+import time
 
 R = 10
-events_queue = Queue.Queue()
+workers = WorkerPool()
+# Optional backend running the nodes instead of the worker threads (see shardedBackend.py and
+# discreteEventBackend.py)
+backend = None
+# Optional on-disk cache of found MSTs (see mstCache.py). Only used then the nodes run in this process
+cache = None
+# Optional compact store of the neighbors of all the nodes (see topologyStore.py). Only used then the nodes run in this
+# process
+topology = None
+# Flag specifying if MST should be found by asynchronous GHS algorithm instead of SynchGHS (see build_MST)
+asynchronous = False
 
 
 def find_MST(nodes, need_logging=False):
     """
-    Performs SynchGHS algorithm to find MST
+    Performs SynchGHS algorithm to find MST. If the same MST has already been found before and kept in the cache,
+    nodes are put into the state they were in after finding it instead.
     :param nodes: List of all known nodes
     :param need_logging: Flag specifying if logging is required
     :return:
     """
+    if cache is not None and (backend is None or backend.nodes_in_process):
+        cache.run(nodes, None, need_logging, lambda: discover_and_build_MST(nodes, need_logging))
+    else:
+        discover_and_build_MST(nodes, need_logging)
+    build_topology(nodes)
 
+
+def discover_and_build_MST(nodes, need_logging=False):
+    """
+    Let the nodes discover their neighbors and then find MST.
+    :param nodes: List of all known nodes
+    :param need_logging: Flag specifying if logging is required
+    """
     # Alert all nodes to start constructing the MST by asking them to discover their neighbors
+    events_queue = Queue.Queue()
     alert_all(nodes, action='discover', args=[events_queue])
 
     # Every node should have broadcast a discover message at this point.
     # Route their message to all nodes that are present in a radius R meters around their locations.
+    # Nodes are indexed by location once, so that routing only needs to look at the nearby nodes.
+    grid = build_grid(nodes)
     while not events_queue.empty():
         event = events_queue.get()
         if event[0] == 'discover':
-            reach_neighbors(nodes, event[1], event[2])
+            reach_neighbors(nodes, event[1], event[2], grid=grid)
 
     # Alert all nodes to start responding to discover messages
-    alert_all(nodes, action='discover_response', handle=True, handle_message=('beacon', None, None))
+    alert_all(nodes, action='discover_response', handle=True, handle_message=DISCOVERY_BEACON_MESSAGE)
+    # Neighbors never change from now on, so they can be moved into the compact store
+    if topology is not None and (backend is None or backend.nodes_in_process):
+        topology.build(nodes)
 
     # Start an actual MST algorithm
-    # It works in levels starting from level 0 and terminates then no more new links have been added into MST.
-    # At each level base station alerts nodes to choose the best link within connected component to be added and
-    # then alerts nodes to merge - elect a new leader within every merged connected component.
+    build_MST(nodes, need_logging)
+
+
+def build_MST(nodes, need_logging=False):
+    """
+    Performs the levels of SynchGHS algorithm. Nodes must already know their neighbors and every connected component
+    of the current MST (initially every single node) must have exactly one leader.
+    It works in levels starting from level 0 and terminates then no more new links have been added into MST.
+    At each level base station alerts nodes to choose the best link within connected component to be added and
+    then alerts nodes to merge - elect a new leader within every merged connected component.
+    If asked for, asynchronous GHS is performed instead (see build_MST_asynchronously).
+    :param nodes: List of all known nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    if asynchronous:
+        build_MST_asynchronously(nodes, need_logging)
+        return
+    events_queue = Queue.Queue()
     level = 0
     while True:
+        if metrics.enabled:
+            metrics.start_level(level)
         alert_leaders_to_start_level(nodes, need_logging)
         alert_all(nodes, 'choose_best_link', args=[level, events_queue], handle=True)
         # If no more new links added - terminate, MST is found.
@@ -43,11 +94,47 @@ def find_MST(nodes, need_logging=False):
         alert_all(nodes, 'merge', args=[level], handle=True)
         new_leaders_elected(nodes, need_logging)
         level += 1
+    if metrics.enabled:
+        metrics.start_level(None)
 
 
-def alert_all(nodes, action, args=(), handle=False, handle_message=('beacon', None, None, None), check=10):
+def build_MST_asynchronously(nodes, need_logging=False):
     """
-    Creates a thread for each of the nodes and triggers given action. It then waits for each of the nodes to finish
+    Performs asynchronous GHS algorithm to find MST (see Node.grow_fragments). There are no levels run by the base
+    station: every fragment connects over its cheapest outgoing link as soon as it finds it, without waiting for
+    the other fragments, and the base station only waits once for no message to be left. Fragments of the algorithm
+    can not continue from the fragments left of the previous MST, so every node starts as a fragment of its own.
+    MST is the same as the one found by SynchGHS, so the nodes are then put into the same state as after it: the node
+    with the biggest ID in every connected component becomes its leader and the links are put into the order they
+    would be added in. The links are logged as one level, in the order the fragments connected over them.
+    Nodes without any neighbors never send a message, so the nodes without enough energy are found by the base
+    station, the same ones that die flooding the first level of SynchGHS (see Node.flood_tree).
+    :param nodes: List of all known nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    if any(node.tree_neighbors for node in nodes):
+        alert_all(nodes, 'keep_fragment', args=[dict((node.node_id, node.node_id) for node in nodes)])
+    events_queue = Queue.Queue()
+    alert_leaders_to_start_level(nodes, need_logging)
+    alert_all(nodes, 'grow_fragments', args=[events_queue], handle=True)
+    for node in nodes:
+        node.check_energy()
+    # If no link has been added, every node stays a leader
+    if events_queue.qsize() == 0:
+        return
+    new_links_added(events_queue, need_logging)
+    alert_all(nodes, 'keep_fragment', args=[find_fragments(nodes, ())])
+    for node in nodes:
+        node.elected = node.leader and bool(node.tree_neighbors)
+    new_leaders_elected(nodes, need_logging)
+    alert_leaders_to_start_level(nodes, need_logging)
+    alert_all(nodes, 'order_tree_links', args=[find_tree_link_order(nodes)])
+
+
+def alert_all(nodes, action, args=(), handle=False, handle_message=BEACON_MESSAGE):
+    """
+    Hands given action to the worker thread of each of the nodes. Workers are kept alive between the calls, so
+     no new threads are created for every phase. It then waits for each of the nodes to finish
      executing. Optionally it can also handle termination then nodes are waiting for a new message, but no one
      is sending any.
     :param nodes: The list of nodes that needs to be alerted
@@ -55,60 +142,134 @@ def alert_all(nodes, action, args=(), handle=False, handle_message=('beacon', No
     :param args: Arguments to be passed into the action function
     :param handle: Boolean flag specifying if termination handling needs to be done
     :param handle_message: Message to be send to all nodes to terminate. Required only id handle=True
-    :param check: Number of consecutive times all nodes are sitting idle before sending a termination message.
-                Only required if handle=True
     """
-    threads = []
-    for node in nodes:
-        action_options = {'discover': node.discover,
-                          'discover_response': node.discover_response,
-                          'choose_best_link': node.choose_best_link,
-                          'merge': node.merge,
-                          'start_bcst': node.start_bcst}
-        t = threading.Thread(target=action_options[action], args=args)
-        threads.append(t)
-        t.start()
+    start = time.time()
+    if backend is not None:
+        backend.alert_all(nodes, action, args, handle, handle_message)
+    else:
+        tasks = []
+        for node in nodes:
+            action_options = {'discover': node.discover,
+                              'discover_response': node.discover_response,
+                              'choose_best_link': node.choose_best_link,
+                              'merge': node.merge,
+                              'start_bcst': node.start_bcst,
+                              'grow_fragments': node.grow_fragments,
+                              'remove_dead_nodes': node.remove_dead_nodes,
+                              'keep_fragment': node.keep_fragment,
+                              'order_tree_links': node.order_tree_links}
+            tasks.append((node, action_options[action], args))
+        if handle and nodes:
+            # The action every node starts with is counted as a message the node is not done with yet
+            nodes[0].in_flight.add(len(nodes))
+        done = workers.submit(tasks)
+
+        if handle:
+            handle_termination(nodes, handle_message)
+
+        # Wait for all nodes to finish
+        workers.wait(done, len(tasks))
 
-    if handle:
-        handle_termination(nodes, handle_message, check)
+    if metrics.enabled:
+        metrics.phase_finished(action, time.time() - start)
 
-    # Wait for all nodes to finish
-    for t in threads:
-        t.join()
+
+def broadcast(nodes, sender):
+    """
+    Perform a broadcast of large volume data from the sender to all other nodes over the current MST.
+    :param nodes: List of all alive nodes
+    :param sender: The ID of the node that initiates the broadcast
+    """
+    # Alert all to start sending\receiving a message from sender node
+    alert_all(nodes, action='start_bcst', args=[[sender]], handle=True)
+
+
+def broadcast_all(nodes, senders):
+    """
+    Perform the broadcasts from all the senders at the same time over the current MST. Every node floods them in the
+    given order, so the energy is spent the same as if they were performed one after another. Nodes only die after
+    all the broadcasts, so it is up to the caller to make sure no node would die before the last one (see
+    BroadcastScheduler.count_until_death).
+    :param nodes: List of all alive nodes
+    :param senders: The IDs of the nodes that initiate the broadcasts, in the order of the broadcasts
+    """
+    alert_all(nodes, action='start_bcst', args=[senders, find_fragments(nodes, ())], handle=True)
 
 
-def handle_termination(nodes, message, check):
+def handle_termination(nodes, message):
     """
-    Handle termination then nodes are waiting for a new message, but no one is sending any new.
+    Handle termination then nodes are waiting for a new message, but no one is sending any new. Base station waits
+    until every message sent between the nodes is done with (see messageCounter.py), which happens right after the
+    last message is handled.
     :param nodes: List of nodes
     :param message: Message to sent to terminate
-    :param check: Number of consecutive times all nodes are sitting idle before sending a termination message
     """
-    init = check
-    while check > 0:
-        state = any([not node.message_queue[node.node_id].empty() for node in nodes])
-        check = init if state else check - 1
-        continue
+    if nodes:
+        nodes[0].in_flight.wait()
     for node in nodes:
         node.message_queue[node.node_id].put(message)
 
 
-def reach_neighbors(nodes, node_id, node_position):
+def get_cell(position):
+    """
+    Find the grid cell the given location falls into. Cells are squares with the side of R meters.
+    :param position: The location in the form (x, y)
+    :return: Cell coordinates in the form (column, row)
+    """
+    return int(math.floor(position[0] / R)), int(math.floor(position[1] / R))
+
+
+def build_grid(nodes):
+    """
+    Build a spatial index of the nodes: a uniform grid with cells of size R. Any node within the distance R from
+    a given location is then guaranteed to be in the same or one of the 8 surrounding cells of that location.
+    :param nodes: The list of all known nodes
+    :return: Dictionary mapping cell coordinates to the list of (index in nodes, node) pairs within that cell
+    """
+    grid = {}
+    for index, node in enumerate(nodes):
+        grid.setdefault(get_cell(node.position), []).append((index, node))
+    return grid
+
+
+def nearby_nodes(grid, position):
+    """
+    Find all nodes that can possibly be within the distance R from the given location.
+    :param grid: Spatial index of the nodes as built by build_grid
+    :param position: The location in the form (x, y)
+    :return: The list of candidate nodes in the same order as they appear in the list of all nodes
+    """
+    column, row = get_cell(position)
+    candidates = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            candidates.extend(grid.get((column + dx, row + dy), []))
+    candidates.sort(key=lambda candidate: candidate[0])
+    return [node for _, node in candidates]
+
+
+def reach_neighbors(nodes, node_id, node_position, grid=None):
     """
     Function used only for routing initial discover messages from one node to another within the distance R.
     :param nodes: The list of all known nodes
     :param node_id: The ID of the node that sends discover message
     :param node_position: The location of the node that send discover message
+    :param grid: Optional spatial index of the nodes (see build_grid). If given, only the nodes in the nearby cells
+                are checked instead of all known nodes
     """
 
-    for node in nodes:
+    for node in (nearby_nodes(grid, node_position) if grid is not None else nodes):
         if node.node_id == node_id:
             continue
         distance = find_distance(node_position, node.position)
         if distance <= R:
             # If node is present in a radius R around the node that is searching
             # ask this node to send discover response message back to the searching node
-            node.message_queue[node.node_id].put(('discover', node_id, node_position))
+            discover = (DISCOVER, node_id, node_position)
+            if metrics.enabled:
+                metrics.message_sent('discover', discover)
+            node.in_flight.add()
+            node.message_queue[node.node_id].put(discover)
 
 
 def find_distance(position_a, position_b):
@@ -126,26 +287,295 @@ def clean(nodes):
     Clean nodes. Done only before the new MST is needed to be found.
     :param nodes: The list of existing alive nodes
     """
+    if backend is not None:
+        backend.clean(nodes)
     for node in nodes:
-        node.leader = True
-        node.elected = False
-        node.neighbors = []
-        node.mst = []
-        node.message_queue[node.node_id] = Queue.Queue()
+        node.clean()
+        node.message_queue[node.node_id] = Queue.Queue() if backend is None else backend.mailbox(node.node_id)
+
+
+def find_root(parents, node_id):
+    """
+    Find the representative of the connected component the node belongs to (union-find with path halving).
+    :param parents: Dictionary mapping node ID to the parent node ID within the component
+    :param node_id: ID of the node
+    :return: ID of the representative node
+    """
+    while parents[node_id] != node_id:
+        parents[node_id] = parents[parents[node_id]]
+        node_id = parents[node_id]
+    return node_id
+
+
+def find_fragments(nodes, dead_node_ids, removed_links=()):
+    """
+    Find the leader of every connected component (fragment) left of MST after the dead nodes or the given links are
+    removed. The node with the biggest ID in the fragment becomes a leader, same as it would after the merge.
+    :param nodes: The list of existing alive nodes
+    :param dead_node_ids: IDs of the dead nodes
+    :param removed_links: Links removed from MST in the form (smaller node ID, bigger node ID)
+    :return: Dictionary mapping the ID of every alive node to the ID of the leader of its fragment
+    """
+    parents = dict((node.node_id, node.node_id) for node in nodes)
+    for node in nodes:
+        for neighbor_id in node.tree_neighbors:
+            if neighbor_id not in dead_node_ids and \
+                    (min(node.node_id, neighbor_id), max(node.node_id, neighbor_id)) not in removed_links:
+                parents[find_root(parents, node.node_id)] = find_root(parents, neighbor_id)
+    leaders = {}
+    for node in nodes:
+        root = find_root(parents, node.node_id)
+        leaders[root] = max(leaders.get(root, node.node_id), node.node_id)
+    return dict((node.node_id, leaders[find_root(parents, node.node_id)]) for node in nodes)
+
+
+def find_tree_link_order(nodes):
+    """
+    Find the order in which every node would add its links into MST if MST was found from scratch. At every level of
+    SynchGHS algorithm each connected component adds its cheapest outgoing link, which is always a link of MST, so the
+    order only depends on the links of MST. Within a level the node first adds the link chosen by its own component
+    (it hears about it from its own leader) and then the links chosen by other components, in the order these
+    components are alerted in. Components compare the links the same way the nodes do (see Node.get_link_key).
+    :param nodes: The list of existing alive nodes
+    :return: Dictionary mapping every link of MST from each of its ends in the form (node ID, neighbor ID) to a key
+            that sorts the links of the node in the order they would be added in
+    """
+    positions = dict((node.node_id, node.position) for node in nodes)
+    indexes = dict((node.node_id, index) for index, node in enumerate(nodes))
+    links = sorted(((find_distance(node.position, positions[neighbor_id]), (node.node_id, neighbor_id))
+                    for node in nodes for neighbor_id in node.tree_neighbors if node.node_id < neighbor_id),
+                   key=get_link_key)
+    parents = dict((node.node_id, node.node_id) for node in nodes)
+    order = {}
+    level = 0
+    while len(order) < 2 * len(links):
+        cheapest = {}
+        for distance, (node_one, node_two) in links:
+            root_one, root_two = find_root(parents, node_one), find_root(parents, node_two)
+            if root_one == root_two:
+                continue
+            for root, link in ((root_one, (node_one, node_two)), (root_two, (node_two, node_one))):
+                if root not in cheapest or get_link_key((distance, link)) < get_link_key(cheapest[root]):
+                    cheapest[root] = (distance, link)
+        # Every link is chosen by the component of its first node
+        chosen = set(link for _, link in cheapest.values())
+        for node_one, node_two in chosen:
+            for node_id, neighbor_id in ((node_one, node_two), (node_two, node_one)):
+                own = (node_id, neighbor_id) in chosen
+                order[(node_id, neighbor_id)] = min(order.get((node_id, neighbor_id), (level + 1,)),
+                                                    (level, 0 if own else 1, indexes[neighbor_id]))
+        for node_one, node_two in chosen:
+            parents[find_root(parents, node_one)] = find_root(parents, node_two)
+        level += 1
+    return order
+
+
+def repair_MST(nodes, dead_nodes, need_logging=False):
+    """
+    Repair MST after the dead nodes are removed from the network. Every link of the old MST between two alive nodes
+    is also in the new MST, so the fragments left of the old MST are kept and only the fragments separated by the
+    dead nodes are connected again by continuing SynchGHS algorithm from these fragments. Neighbors are not
+    discovered again. Same as find_MST, repaired MST can come from the cache.
+    :param nodes: The list of existing alive nodes
+    :param dead_nodes: The list of dead nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    if cache is not None and (backend is None or backend.nodes_in_process):
+        cache.run(nodes, dead_nodes, need_logging, lambda: reconnect_fragments(nodes, dead_nodes, need_logging))
+    else:
+        reconnect_fragments(nodes, dead_nodes, need_logging)
+    build_topology(nodes)
+
+
+def build_topology(nodes):
+    """
+    Move the neighbors into the compact store of the neighbors, if there is one and they are not there yet. Neighbors
+    put back from the cache are kept by the nodes themselves again.
+    :param nodes: The list of existing alive nodes
+    """
+    if topology is not None and (backend is None or backend.nodes_in_process) and not topology.holds(nodes):
+        topology.build(nodes)
+
+
+def reconnect_fragments(nodes, dead_nodes, need_logging=False):
+    """
+    Remove the dead nodes from MST and connect the fragments left of it again (see repair_MST).
+    :param nodes: The list of existing alive nodes
+    :param dead_nodes: The list of dead nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    dead_node_ids = set(node.node_id for node in dead_nodes)
+    alert_all(nodes, 'remove_dead_nodes', args=[dead_node_ids, find_fragments(nodes, dead_node_ids)])
+    # If all dead nodes were leaves of MST, no fragments were separated and the remaining MST is already the MST
+    # of the remaining network
+    if not all(node.get_links_in_mst_from_me() <= 1 for node in dead_nodes):
+        build_MST(nodes, need_logging)
+    # Nodes send over their links in MST in the order the links were added. Links kept from the old MST were added
+    # before the new ones, so the links are put into the order they would be added in if MST was found from scratch
+    alert_all(nodes, 'order_tree_links', args=[find_tree_link_order(nodes)])
+
+
+def join_nodes(nodes, new_nodes, need_logging=False):
+    """
+    Add new nodes into the network after MST has been found. Only the new nodes and the nodes within the distance R
+    from them discover each other, everything else the nodes know is kept. Every link of the new nodes closing a cycle
+    in MST makes the most expensive link on that cycle useless (see insert_links), so only these links are removed
+    from MST and the fragments left of it (with every new node as a fragment of its own) are connected again by
+    continuing SynchGHS algorithm from these fragments, the same as repair_MST does. The result is the same MST as
+    if it was found from scratch over all the nodes. Same as find_MST, MST can come from the cache.
+    New nodes must share the message queues, the counter of the messages and the minimum budget of the nodes (see
+    Simulation.join).
+    :param nodes: The list of existing alive nodes
+    :param new_nodes: The list of the new nodes
+    :param need_logging: Flag specifying if logging is required
+    :return: The list of all alive nodes, the new ones after the existing ones
+    """
+    all_nodes = nodes + new_nodes
+    if backend is not None:
+        backend.add_nodes(nodes, new_nodes)
+    if cache is not None and (backend is None or backend.nodes_in_process):
+        cache.add_nodes(new_nodes)
+        cache.run(all_nodes, None, need_logging, lambda: connect_new_nodes(nodes, new_nodes, need_logging),
+                  new_nodes=new_nodes)
+    else:
+        connect_new_nodes(nodes, new_nodes, need_logging)
+    build_topology(all_nodes)
+    return all_nodes
+
+
+def connect_new_nodes(nodes, new_nodes, need_logging=False):
+    """
+    Let the new nodes discover their neighbors and connect them into MST (see join_nodes).
+    :param nodes: The list of existing alive nodes
+    :param new_nodes: The list of the new nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    all_nodes = nodes + new_nodes
+    new_links = discover_new_nodes(nodes, new_nodes)
+    old_links = set((min(node.node_id, neighbor_id), max(node.node_id, neighbor_id))
+                    for node in nodes for neighbor_id in node.tree_neighbors)
+    removed_links = old_links - set(link for _, link in insert_links(all_nodes, new_links))
+    alert_all(all_nodes, 'keep_fragment', args=[find_fragments(all_nodes, (), removed_links)])
+    # New nodes without any neighbors stay on their own and the rest of MST does not change
+    if new_links:
+        build_MST(all_nodes, need_logging)
+    alert_all(all_nodes, 'order_tree_links', args=[find_tree_link_order(all_nodes)])
+
+
+def find_new_links(nodes, new_nodes):
+    """
+    Find the links the new nodes bring into the network, i.e. all pairs of nodes within the distance R from each other
+    with at least one of them new.
+    :param nodes: The list of existing alive nodes
+    :param new_nodes: The list of the new nodes
+    :return: List of links in the form (distance, (smaller node ID, bigger node ID)), cheapest first
+    """
+    grid = build_grid(nodes + new_nodes)
+    links = set()
+    for new_node in new_nodes:
+        for node in nearby_nodes(grid, new_node.position):
+            if node.node_id == new_node.node_id:
+                continue
+            distance = find_distance(new_node.position, node.position)
+            if distance <= R:
+                links.add((distance, (min(node.node_id, new_node.node_id), max(node.node_id, new_node.node_id))))
+    return sorted(links)
+
+
+def discover_new_nodes(nodes, new_nodes):
+    """
+    Let the new nodes and the existing nodes within the distance R from them discover each other. Existing nodes
+    already know each other, so their discover messages are only routed to the new nodes.
+    :param nodes: The list of existing alive nodes
+    :param new_nodes: The list of the new nodes
+    :return: The links the new nodes bring into the network (see find_new_links)
+    """
+    new_links = find_new_links(nodes, new_nodes)
+    new_ids = set(node.node_id for node in new_nodes)
+    reached_ids = set(node_id for _, link in new_links for node_id in link if node_id not in new_ids)
+    reached = [node for node in nodes if node.node_id in reached_ids]
+
+    events_queue = Queue.Queue()
+    alert_all(new_nodes + reached, action='discover', args=[events_queue])
+    grid = build_grid(nodes + new_nodes)
+    new_grid = build_grid(new_nodes)
+    while not events_queue.empty():
+        event = events_queue.get()
+        if event[0] == 'discover':
+            if event[1] in new_ids:
+                reach_neighbors(nodes + new_nodes, event[1], event[2], grid=grid)
+            else:
+                reach_neighbors(new_nodes, event[1], event[2], grid=new_grid)
+
+    alert_all(new_nodes + reached, action='discover_response', handle=True,
+              handle_message=DISCOVERY_BEACON_MESSAGE)
+    return new_links
+
+
+def insert_links(nodes, new_links):
+    """
+    Find MST once the given links are added into the network. Links are added into the current MST one at the time.
+    If the link closes a cycle, the most expensive link on the cycle (links are compared the same way the nodes compare
+    them, see Node.get_link_key) can not be in MST and is removed, which might be the new link itself.
+    :param nodes: The list of all alive nodes, with the current MST
+    :param new_links: Links added into the network in the form (distance, (smaller node ID, bigger node ID))
+    :return: List of links in the new MST in the form (distance, (smaller node ID, bigger node ID))
+    """
+    positions = dict((node.node_id, node.position) for node in nodes)
+    tree = dict((node.node_id, set(node.tree_neighbors)) for node in nodes)
+    for distance, link in new_links:
+        path = find_tree_path(tree, link[0], link[1])
+        if path is not None:
+            costliest = max(get_link_key((find_distance(positions[node_one], positions[node_two]),
+                                          (node_one, node_two))) for node_one, node_two in path)
+            if costliest < get_link_key((distance, link)):
+                continue
+            tree[costliest[1][0]].discard(costliest[1][1])
+            tree[costliest[1][1]].discard(costliest[1][0])
+        tree[link[0]].add(link[1])
+        tree[link[1]].add(link[0])
+    return sorted((find_distance(positions[node_id], positions[neighbor_id]), (node_id, neighbor_id))
+                  for node_id, neighbor_ids in tree.items() for neighbor_id in neighbor_ids if node_id < neighbor_id)
+
+
+def find_tree_path(tree, start_id, end_id):
+    """
+    Find the path between two nodes in a tree (or forest).
+    :param tree: Dictionary mapping node ID to the set of IDs of its neighbors in the tree
+    :param start_id: ID of the node the path starts at
+    :param end_id: ID of the node the path ends at
+    :return: List of the links on the path in the form (node ID, next node ID), None if the nodes are not connected
+    """
+    parents = {start_id: None}
+    queue = collections.deque([start_id])
+    while queue and end_id not in parents:
+        node_id = queue.popleft()
+        for neighbor_id in tree[node_id]:
+            if neighbor_id not in parents:
+                parents[neighbor_id] = node_id
+                queue.append(neighbor_id)
+    if end_id not in parents:
+        return None
+    path = []
+    node_id = end_id
+    while parents[node_id] is not None:
+        path.append((parents[node_id], node_id))
+        node_id = parents[node_id]
+    return path
 
 
 def handle_dead_nodes(given_nodes):
     """
-    Check if any of the given nodes is dead and if yes then log them, remove from the nodes list, clean
-    all the nodes that are still alive and recompute the MST.
+    Check if any of the given nodes is dead and if yes then log them, remove from the nodes list and repair
+    the MST between the nodes that are still alive.
     :param given_nodes: List of nodes
     :return: List of nodes with calculated new MST excluding dead nodes
     """
     dead_nodes = [node for node in given_nodes if not node.alive]
     if dead_nodes:
         nodes_dead(dead_nodes)
+        workers.retire(dead_nodes)
         given_nodes = [node for node in given_nodes if node.alive]
-        clean(given_nodes)
-        find_MST(given_nodes)
+        repair_MST(given_nodes, dead_nodes)
 
-    return given_nodes
\ No newline at end of file
+    return given_nodes
@@ -1,45 +1,85 @@
-from logProducer import get_file_name, get_file_mode
+from logProducer import data_sent
+from messages import *
+from messageCounter import MessageCounter
+from topologyStore import NeighborView, CandidateHeap, get_candidates, get_tree, without
+import metrics
 import math
-import logging
 import Queue
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(message)s',
-                    filename=get_file_name(),
-                    filemode=get_file_mode())
+# Weight reported by a fragment of asynchronous GHS that has no outgoing link, bigger than the weight of any link
+NO_LINK = (float('inf'), ())
 
 
-class Node:
+def get_link_key(link):
+    """
+    Links are compared by their distance and then by the IDs of their ends, the same whichever end the link is seen
+    from, so that all the components agree on the order of the links even if some of them are equally long.
+    :param link: Link in the form (distance, (node ID, neighbor ID))
+    :return: The key of the link in the form (distance, (smaller node ID, bigger node ID))
+    """
+    distance, (node_one, node_two) = link
+    return distance, (min(node_one, node_two), max(node_one, node_two))
+
+
+class Node(object):
     """ Class for all nodes """
-    message_queue = {}
-    minimum_budget = 0
+    __slots__ = ('node_id', 'position', 'energy', 'leader', 'elected', 'fragment', 'alive', 'neighbors', 'candidates',
+                 'mst', 'mst_links', 'mst_nodes', 'tree_neighbors', 'expected_messages', 'cheapest_link',
+                 'node_to_leader', 'shared_links', 'stage', 'level', 'events_queue', 'deferred', 'broadcasts',
+                 'arrived', 'searching', 'in_branch', 'best_link', 'best_weight', 'test_link', 'find_count',
+                 'rejected', 'message_queue', 'in_flight', 'minimum_budget')
 
-    def __init__(self, node_id, position, energy):
+    def __init__(self, node_id, position, energy, message_queue=None, in_flight=None, minimum_budget=0):
         """
         Create new node by passing the following information.
         :param node_id: Unique ID of the node
         :param position: Position of the node in form (x, y) coordinate
         :param energy: The current energy of the node
+        :param message_queue: Dictionary mapping node ID to the message queue of the node. All nodes of the same network
+                    must share the same dictionary, so that they can send messages to each other. This node's queue is
+                    added into it
+        :param in_flight: Counter of the messages sent between the nodes (see messageCounter.py), shared by all nodes of
+                    the same network
+        :param minimum_budget: Minimum energy the node needs to stay alive
 
         The node then also initializes and maintains the following information:
             - Is this node a leader (initially yes)
             - Is this node elected as being a leader (initially no)
+            - The ID of the leader of the connected component this node is in (initially this node's ID)
             - Is this node alive (initially yes)
-            - The list of all the neighbors for the node
+            - All the neighbors for the node, mapping neighbor ID to its position and distance to it
+            - Heap of the links to the neighbors that might still be added into MST (see find_cheapest_link)
             - The currently known MST for node (note that node keeps only the links that are connected between
-                this node and other node or between two nodes that are both neighbors of this node
+                this node and other node or between two nodes that are both neighbors of this node. See store_link
+                for the indexes kept together with it. Node keeping its neighbors in the compact store only keeps
+                its own links, in the store as well, see index_mst
             - Message queue. This is the queue there all the messages from other nodes or base station comes.
         """
         self.node_id = int(node_id)
         self.position = (float(position[0]), float(position[1]))
         self.energy = float(energy)
-        self.leader = True
-        self.elected = False
         self.alive = True
-        self.neighbors = []
-        self.mst = []
+        self.minimum_budget = minimum_budget
+        self.message_queue = message_queue if message_queue is not None else {}
+        self.in_flight = in_flight if in_flight is not None else MessageCounter()
+        self.clean()
         self.message_queue[self.node_id] = Queue.Queue()
 
+    def clean(self):
+        """
+        Forget everything known about the network (neighbors and MST) and become a leader again.
+        """
+        self.leader = True
+        self.elected = False
+        self.fragment = self.node_id
+        self.neighbors = {}
+        self.candidates = CandidateHeap()
+        self.index_mst([])
+        self.stage = None
+        self.deferred = []
+        self.broadcasts = []
+        self.arrived = {}
+
     def discover(self, events_queue):
         """
         Node broadcasts a discover message. Since node does not yet know to which nodes he is sending the message
@@ -53,24 +93,77 @@ class Node:
         Respond to discover (by sending discover response) and discover response
         (by updating the neighbors) messages. If message from base station is received - stop waiting and terminate.
         """
-        while True:
-            if self.message_queue[self.node_id].empty():
-                continue
-            message_type, sender_id, sender_position = self.message_queue[self.node_id].get()
-            if message_type == 'beacon':
-                break
-            if message_type == 'discover':
-                self.message_queue[sender_id].put(('discover_response', self.node_id, self.position))
-            if message_type == 'discover_response':
-                self.update_neighbors(sender_id, sender_position)
+        self.begin_discover_response()
+        self.receive_all()
+
+    def begin_discover_response(self):
+        """
+        Same as discover_response, but only starts the action. Messages are then handled as they
+        are delivered (see deliver).
+        """
+        self.stage = Node.on_discovery_message
+
+    def on_discovery_message(self, envelope):
+        message_type, sender_id, sender_position = envelope
+        if message_type == BEACON:
+            self.stage = None
+        if message_type == DISCOVER:
+            response = (DISCOVER_RESPONSE, self.node_id, self.position)
+            if metrics.enabled:
+                metrics.message_sent('discover_response', response)
+            self.in_flight.add()
+            self.message_queue[sender_id].put(response)
+        if message_type == DISCOVER_RESPONSE:
+            self.update_neighbors(sender_id, sender_position)
 
     def update_neighbors(self, responding_node_id, responding_node_position):
         """
-        Update the list of neighbors by adding a new neighbor.
+        Update the neighbors by adding a new neighbor. Distance to the neighbor is found only once, here.
         :param responding_node_id: ID of neighbor node to be added
         :param responding_node_position: Position of neigbor node to be added
         """
-        self.neighbors.append((responding_node_id, responding_node_position))
+        # Neighbors kept in the compact store never change, so once a new node joins the network next to this node
+        # (see MST.join_nodes) the node keeps its neighbors by itself again
+        if not isinstance(self.neighbors, dict):
+            self.neighbors = dict(self.neighbors.items())
+            self.candidates = get_candidates(self.node_id, self.neighbors)
+            self.index_mst(self.get_mst())
+        distance = self.find_distance(responding_node_position)
+        self.neighbors[responding_node_id] = (responding_node_position, distance)
+        self.candidates.push((distance, (self.node_id, responding_node_id)))
+
+    def receive_all(self):
+        """
+        Handle the messages arriving into this node's message queue one at the time until the node is done with the
+        action it was alerted to perform.
+        """
+        while self.stage is not None:
+            self.deliver(self.receive())
+
+    def deliver(self, envelope):
+        """
+        Handle a single message that arrived to this node. Every action is performed in stages (waiting for the
+        discover messages, for the cheapest links, for all other neighbor messages), each handling the messages in its
+        own way. Node is done with the action then the stage is None.
+        Base station either lets the node wait for the messages itself (see receive_all) or delivers every message
+        to the node by itself (see discreteEventBackend.py).
+        :param envelope: The received message
+        """
+        self.stage(self, envelope)
+
+    def receive(self):
+        """
+        Wait for the next message to arrive into this node's message queue. The node is blocked (and does not use
+        any CPU) until someone puts a message into its queue.
+        Asking for the next message means the node is done with the previous one (or with the action it started the
+        phase with), see messageCounter.py.
+        :return: The received message
+        """
+        self.in_flight.finish()
+        queue = self.message_queue[self.node_id]
+        if metrics.enabled:
+            metrics.mailbox_depth(self.node_id, queue.qsize())
+        return queue.get()
 
     def send_neighbor(self, message_id, message, neighbor_id):
         """
@@ -79,7 +172,11 @@ class Node:
         :param message: Message that needs to be sent
         :param neighbor_id: Node ID to which message need to be sent
         """
-        self.message_queue[neighbor_id].put(('neighbor', message_id, message, self.node_id))
+        envelope = (NEIGHBOR, message_id, message, self.node_id)
+        if metrics.enabled:
+            metrics.message_sent(NEIGHBOR_MESSAGE_NAMES[message.type], envelope)
+        self.in_flight.add()
+        self.message_queue[neighbor_id].put(envelope)
 
     def is_neighbor(self, node_id):
         """
@@ -87,17 +184,14 @@ class Node:
         :param node_id: ID of the node to be checked
         :return: Boolean variable saying if node is a neighbor or not
         """
-        for neighbor, _ in self.neighbors:
-            if neighbor == node_id:
-                return True
-        return False
+        return node_id in self.neighbors
 
     def get_links_in_mst_from_me(self):
         """
         Get the number of links from this node in the current MST.
         Note that node keeps links in a way such that if this node is in the link, then it is presented first
         """
-        return len([node_one for node_one, _ in self.mst if node_one == self.node_id])
+        return len(self.tree_neighbors)
 
     def find_cheapest_link(self):
         """
@@ -106,10 +200,11 @@ class Node:
         :return: Cheapest link and distance to the node on the other end of the link.
             Return None if no more links can be added from this node
         """
-        all_distances = ([(self.find_distance(neighbor_position), (self.node_id, neighbor_id))
-                          for neighbor_id, neighbor_position in self.neighbors
-                          if not [neighbor_id for link in self.mst if neighbor_id in link]])
-        return min(all_distances) if all_distances else None
+        # Once a neighbor is in MST it stays there, so links to such neighbors are only removed from the heap
+        # then they get to the top of it
+        while self.candidates and self.candidates[0][1][1] in self.mst_nodes:
+            self.candidates.skip()
+        return self.candidates[0] if self.candidates else None
 
     def choose_best_link(self, level, events_queue):
         """
@@ -118,39 +213,110 @@ class Node:
         :param level: The current level of MST algorithm.
         :param events_queue: Used only for logging the cheapest link.
         """
+        self.begin_choose_best_link(level, events_queue)
+        self.receive_all()
+
+    def begin_choose_best_link(self, level, events_queue):
+        """
+        Same as choose_best_link, but only starts the action. Messages are then handled as they
+        are delivered (see deliver).
+        """
+        self.level = level
+        self.events_queue = events_queue
         # If a leader, broadcast a message inside the tree for each node to identify a new edge to add to MST.
         if self.leader:
-            self.flood_tree(level, message={'type': 'find_cheapest_link'})
+            self.flood_tree(level, message=FIND_CHEAPEST_LINK_MESSAGE)
         # Wait for the messages or answers to messages
-        cheapest_link = self.receive_cheapest_link(level)
+        self.receive_cheapest_link(level)
+
+    def cheapest_link_found(self):
+        """
+        Called then all the messages node waited for while finding the cheapest link have been received.
+        """
+        # Send back to leader with the cheapest link if this node is not a leader
+        if not self.leader:
+            self.send_neighbor(self.level, Message(MY_CHEAPEST_LINK, self.cheapest_link), self.node_to_leader)
         # Append this neighbor to MST if a leader and if cheapest link is found
-        if self.leader and cheapest_link:
-            events_queue.put(('log', cheapest_link[1]))
-            self.add_link_to_mst(cheapest_link[1])
+        if self.leader and self.cheapest_link:
+            self.events_queue.put(('log', self.cheapest_link[1]))
+            self.add_link_to_mst(self.cheapest_link[1])
             # Finally, flood the decision to the tree
-            self.flood_tree(level, message={'type': 'link_decision', 'data': cheapest_link[1]})
+            self.flood_tree(self.level, message=Message(LINK_DECISION, self.cheapest_link[1]))
         # Wait for the link decision to arrive
-        self.receive_neighbor(level)
+        self.receive_neighbor(self.level)
+        # Messages that arrived too early are handled now, each as if it just arrived
+        deferred, self.deferred = self.deferred, []
+        for envelope in deferred:
+            self.deliver(envelope)
+            self.in_flight.finish()
 
     def merge(self, level):
         """
         Main function used to merge connected components by electing a new leader within each new component.
         :param level: The current level of MST algorithm
         """
-        # At the start of the merge none of the nodes are elected
+        self.begin_merge(level)
+        self.receive_all()
+
+    def begin_merge(self, level):
+        """
+        Same as merge, but only starts the action. Messages are then handled as they
+        are delivered (see deliver).
+        """
+        # At the start of the merge none of the nodes are elected. Every node learns the ID of the new leader of its
+        # connected component from the proposals - it is the biggest proposed ID
         self.elected = False
+        self.fragment = self.node_id if self.leader else None
         # If a leader, propose id by flooding leader id to the tree
         if self.leader:
-            self.flood_tree(level, message={'type': 'id_proposal', 'data': self.node_id})
+            self.flood_tree(level, message=Message(ID_PROPOSAL, self.node_id))
         # Wait for receiving messages
         self.receive_neighbor(level)
 
+    def remove_dead_nodes(self, dead_node_ids, fragments):
+        """
+        Forget about the dead nodes: remove them from the neighbors and remove all the links with them from MST.
+        Only the links within the fragment of MST this node is left in are kept (see keep_fragment).
+        :param dead_node_ids: IDs of the dead nodes
+        :param fragments: Dictionary mapping the ID of every alive node to the ID of the leader of its fragment
+        """
+        self.neighbors = without(self.neighbors, dead_node_ids)
+        self.keep_fragment(fragments)
+
+    def keep_fragment(self, fragments):
+        """
+        Keep only the links of MST within the fragment this node is in and become its leader if the node has the
+        biggest ID in it. Links between the neighbors that are now in other fragments are forgotten, so that the links
+        to such neighbors can be added into MST again.
+        :param fragments: Dictionary mapping the ID of every alive node to the ID of the leader of its fragment
+        """
+        fragment = fragments[self.node_id]
+        self.index_mst([link for link in self.get_mst()
+                        if fragments.get(link[0]) == fragment and fragments.get(link[1]) == fragment])
+        # Neighbors that were in MST only through the dead nodes or the removed links can be added into MST again
+        self.candidates = get_candidates(self.node_id, self.neighbors)
+        self.leader = fragment == self.node_id
+        self.elected = False
+        self.fragment = fragment
+
+    def order_tree_links(self, order):
+        """
+        Put the neighbors this node has a link with into the order the links would be added into MST if it was found
+        from scratch.
+        :param order: Dictionary mapping every link of MST in the form (node ID, neighbor ID) to the key the links
+                    are sorted by (see MST.find_tree_link_order)
+        """
+        self.tree_neighbors.sort(key=lambda neighbor_id: order[(self.node_id, neighbor_id)])
+        # Links kept in the store are shared in the order of the neighbors (see get_mst), which is not the same now
+        self.shared_links = {}
+
     def flood_tree(self, message_id=None, message=None, except_nodes=None):
         """
         Send neighbor messages to all neighbors that are already in MST and has a link to this node.
         In case node shares the link decision with the node from other connected component (this can only happen
-            then the cheapest link is actually the link between these two nodes in different components) - send full
-            currently known MST, so that nodes in other components knows about the nodes and MST in this one.
+            then the cheapest link is actually the link between these two nodes in different components) - send
+            currently known MST (see send_current_mst), so that nodes in other components knows about the nodes and
+            MST in this one.
         In case data broadcast needs to be performed (large volume data to be sent) - update the energy and log
             the data transfer.
         If after performing all broadcast energy level drops below minimum budget - node dies.
@@ -158,67 +324,102 @@ class Node:
         :param message: The message to be sent
         :param except_nodes: The list of node IDs to which the message should not be sent
         """
-        for link in self.mst:
-            if (link[0] == self.node_id) and (not link[1] in (except_nodes if except_nodes else [])):
-                if (message['type'] == 'link_decision') and (self.node_id in message['data']) and (link[1] in message['data']):
-                    self.send_neighbor(message_id, {'type': 'my_current_mst', 'data': self.mst}, link[1])
+        for neighbor_id in self.tree_neighbors:
+            if not neighbor_id in (except_nodes if except_nodes else []):
+                if (message.type == LINK_DECISION) and (self.node_id in message.data) and (neighbor_id in message.data):
+                    self.send_current_mst(message_id, neighbor_id)
                     continue
-                if message['type'] == 'data_broadcast':
-                    self.energy -= self.find_distance(
-                        [position for neighbor_id, position in self.neighbors if neighbor_id == link[1]][0])*1.2
-                    logging.info('data from %s to %s, energy:%s' % (self.node_id, link[1], self.energy))
-                self.send_neighbor(message_id, message, link[1])
+                if message.type == DATA_BROADCAST:
+                    self.energy -= self.neighbors[neighbor_id][1]*1.2
+                    data_sent(self.node_id, neighbor_id, self.energy)
+                self.send_neighbor(message_id, message, neighbor_id)
+        self.check_energy()
+
+    def check_energy(self):
+        """
+        Die if the energy level is below the minimum budget.
+        """
         if self.energy < self.minimum_budget:
             self.alive = False
 
     def receive_cheapest_link(self, level):
         """
-        Node waits for the incoming neighbor message from the leader asking to find the cheapest link (if not leader),
-        floods it to other connected neighbors and then waits for the answers with the cheapest links from every
-        node that does not have a path to the leader through this node. After all expected messages have been
-        received - send a cheapest link to the node that asked to find it.
+        Start waiting for the incoming neighbor message from the leader asking to find the cheapest link (if not
+        leader), floods it to other connected neighbors and then waits for the answers with the cheapest links from
+        every node that does not have a path to the leader through this node. After all expected messages have been
+        received - send a cheapest link to the node that asked to find it (see cheapest_link_found).
+        Node does not keep the links of its connected component it is not part of, so a neighbor might be in the same
+            component without the node knowing about it. The cheapest link of the node itself is only known after the
+            neighbor on the other end of it tells it is in another component (see test_cheapest_link).
         :param level: The current level of MST algorithm
-        :return: The cheapest currently known link (if leader - that's indeed the cheapest link within the component)
         """
         # Wait for expected number of messages
         # Every neighbor in MST will eventually need to send exactly one message (1 asks to find the cheapest link,
         # others sends the cheapest link)
-        expected_messages = self.get_links_in_mst_from_me()
+        self.expected_messages = self.get_links_in_mst_from_me()
         # Find the cheapest link within this node and neighbors that are not in this connected component
+        self.cheapest_link = None
+        if self.test_cheapest_link(level):
+            self.expected_messages += 1
+        self.node_to_leader = None
+        self.stage = Node.on_cheapest_link_message
+        if self.expected_messages == 0:
+            self.cheapest_link_found()
+
+    def on_cheapest_link_message(self, envelope):
+        communication_type, message_id, message, sender_id = envelope
+        handler = self.cheapest_link_handlers.get(message.type)
+        if handler:
+            handler(self, message_id, message, sender_id)
+        # If some connected component decides on new link to be added faster than this connected component
+        # and sends link decision to this node - put this message aside until the cheapest link is found, so that
+        # link decision could be made first in this component. It stays counted as not done with until then
+        else:
+            self.in_flight.add()
+            self.deferred.append(envelope)
+            if metrics.enabled:
+                metrics.requeued('reordering')
+        if self.expected_messages == 0:
+            self.cheapest_link_found()
+
+    def test_cheapest_link(self, message_id):
+        """
+        Ask the neighbor on the other end of the cheapest link of this node if it is in another connected component.
+        :param message_id: The ID of the message to be sent
+        :return: True if the neighbor was asked, False if no more links can be added from this node
+        """
         cheapest_link = self.find_cheapest_link()
-        node_to_leader = None
-        while True:
-            if expected_messages == 0:
-                break
-            if self.message_queue[self.node_id].empty():
-                continue
-            communication_type, message_id, message, sender_id = self.message_queue[self.node_id].get()
-            # Make sure that base station does not send termination message if message queue is empty, but
-            # node is still performing some actions. This will be only crucial in huge networks.
-            if communication_type == 'care':
-                continue
-            self.message_queue[self.node_id].put(('care', None, None, None))
-            if message['type'] == 'find_cheapest_link':
-                self.flood_tree(message_id, message=message, except_nodes=[sender_id])
-                node_to_leader = sender_id
-                expected_messages -= 1
-            if message['type'] == 'my_cheapest_link':
-                cheapest_link = self.compare_two_links(cheapest_link, message['data'])
-                expected_messages -= 1
-            # If some connected component decides on new link to be added faster than this connected component
-            # and sends link decision to this node - put this message back to the end of the queue, so that link
-            # decision could be made first in this component
-            if message['type'] == 'link_decision' or message['type'] == 'my_current_mst':
-                self.message_queue[self.node_id].put(('reordering', message_id, message, sender_id))
+        if cheapest_link is None:
+            return False
+        self.send_neighbor(message_id, Message(TEST, self.fragment), cheapest_link[1][1])
+        return True
 
-        # Send back to leader with the cheapest link if this node is not a leader
-        if not self.leader:
-            self.send_neighbor(level, {'type': 'my_cheapest_link', 'data': cheapest_link}, node_to_leader)
-        return cheapest_link
+    def on_test(self, message_id, message, sender_id):
+        answer = ACCEPT_MESSAGE if message.data != self.fragment else REJECT_MESSAGE
+        self.send_neighbor(message_id, answer, sender_id)
+
+    def on_accept(self, message_id, message, sender_id):
+        self.cheapest_link = self.compare_two_links(self.cheapest_link, self.find_cheapest_link())
+        self.expected_messages -= 1
+
+    def on_reject(self, message_id, message, sender_id):
+        # The neighbor is in the same connected component, so the link to it can never be added into MST
+        self.candidates.skip()
+        if not self.test_cheapest_link(message_id):
+            self.expected_messages -= 1
+
+    def on_find_cheapest_link(self, message_id, message, sender_id):
+        self.flood_tree(message_id, message=message, except_nodes=[sender_id])
+        self.node_to_leader = sender_id
+        self.expected_messages -= 1
+
+    def on_my_cheapest_link(self, message_id, message, sender_id):
+        self.cheapest_link = self.compare_two_links(self.cheapest_link, message.data)
+        self.expected_messages -= 1
 
     def receive_neighbor(self, level=None):
         """
-        Receives all neighbor messages that are not related to cheapest link findings. It waits for a new
+        Start receiving all neighbor messages that are not related to cheapest link findings. It waits for a new
         message until it gets message from the base station meaning that no one will send anything new in this round
         and the node can terminate.
         If received link decision message - see if the received link can be added into current MST and add it if
@@ -233,40 +434,50 @@ class Node:
             remaining tree.
         :param level: The current level of the MST algorithm
         """
-        while True:
-            if self.message_queue[self.node_id].empty():
-                continue
-            communication_type, message_id, message, sender_id = self.message_queue[self.node_id].get()
-            if communication_type == 'care':
-                continue
-            self.message_queue[self.node_id].put(('care', None, None, None))
-            if communication_type == 'beacon':
-                break
-            if message['type'] == 'link_decision':
-                self.add_link_to_mst(message['data'], level=level, sender_id=sender_id)
-                self.flood_tree(level, message={'type': 'link_decision', 'data': message['data']},
-                                except_nodes=[sender_id])
-            if message['type'] == 'my_current_mst':
-                for link in message['data']:
-                    added = self.add_link_to_mst(link, level=level, sender_id=sender_id)
-                    if added:
-                        self.flood_tree(level, message={'type': 'link_decision', 'data': link}, except_nodes=[sender_id])
-            if message['type'] == 'id_proposal':
-                if message['data'] > self.node_id:
-                    self.leader = False
-                    self.elected = False
-                else:
-                    if self.leader:
-                        self.elected = True
-                # Flood proposal to others in the tree (except the sender)
-                self.flood_tree(message_id, message=message, except_nodes=[sender_id])
-            if message['type'] == 'data_broadcast':
-                self.flood_tree(message=message, except_nodes=[sender_id])
+        self.level = level
+        self.stage = Node.on_neighbor_message
+
+    def on_neighbor_message(self, envelope):
+        communication_type, message_id, message, sender_id = envelope
+        if communication_type == BEACON:
+            self.stage = None
+            return
+        handler = self.neighbor_handlers.get(message.type)
+        if handler:
+            handler(self, self.level, message_id, message, sender_id)
+
+    def on_link_decision(self, level, message_id, message, sender_id):
+        self.add_link_to_mst(message.data, level=level, sender_id=sender_id)
+        self.flood_tree(level, message=message, except_nodes=[sender_id])
+
+    def on_my_current_mst(self, level, message_id, message, sender_id):
+        for link in message.data:
+            added = self.add_link_to_mst(link, level=level, sender_id=sender_id)
+            if added:
+                self.flood_tree(level, message=Message(LINK_DECISION, link), except_nodes=[sender_id])
+
+    def on_id_proposal(self, level, message_id, message, sender_id):
+        self.fragment = max(self.fragment, message.data)
+        if message.data > self.node_id:
+            self.leader = False
+            self.elected = False
+        else:
+            if self.leader:
+                self.elected = True
+        # Flood proposal to others in the tree (except the sender)
+        self.flood_tree(message_id, message=message, except_nodes=[sender_id])
+
+    def on_data_broadcast(self, level, message_id, message, sender_id):
+        self.arrived[message_id] = sender_id
+        self.forward_broadcasts()
+
+    def on_neighbor_test(self, level, message_id, message, sender_id):
+        self.on_test(message_id, message, sender_id)
 
     def compare_two_links(self, link_one, link_two):
         """
-        Find the link with the minimum distance from the connected component by comparing two links.
-        If one of them is None, receive another one.
+        Find the link with the minimum distance from the connected component by comparing two links (see
+        get_link_key). If one of them is None, receive another one.
         :param link_one: First link to be compared in the form - (minimum distance, link)
         :param link_two: Second link to be compared
         :return: Link with the smaller distance
@@ -275,7 +486,7 @@ class Node:
             return link_two
         if not link_two:
             return link_one
-        return min(link_one, link_two)
+        return min(link_one, link_two, key=get_link_key)
 
     def add_link_to_mst(self, cheapest_link, level=None, sender_id=None):
         """
@@ -283,18 +494,18 @@ class Node:
         If the link is already in MST - we are done.
         If link includes two of this node's neighbors but not himself - include the link into MST.
         If link includes this node - add the link into MST and inform the neighbor that sent this link with the
-            my current mst message just to make sure sender knows about this node's current MST that he might be
-            missing.
+            my current mst message (see send_current_mst) just to make sure sender knows about this node's current MST
+            that he might be missing.
         :param cheapest_link: The link to be considered for addition into MST
         :param level: The current level of MST algorithm
         :param sender_id: The ID of the sender who sent this link.
         :return:
         """
-        if cheapest_link in self.mst or (cheapest_link[1], cheapest_link[0]) in self.mst:
+        if self.knows_link(cheapest_link):
             return False
 
-        if self.is_neighbor(cheapest_link[0]) and self.is_neighbor(cheapest_link[1]):
-            self.mst.append(cheapest_link)
+        if self.mst is not None and self.is_neighbor(cheapest_link[0]) and self.is_neighbor(cheapest_link[1]):
+            self.store_link(cheapest_link, sender_id)
             return True
 
         new_link = None
@@ -304,11 +515,93 @@ class Node:
             new_link = (self.node_id, cheapest_link[0])
         if new_link:
             if sender_id:
-                self.send_neighbor(level, {'type': 'my_current_mst', 'data': self.mst}, sender_id)
-            self.mst.append(new_link)
+                self.send_current_mst(level, sender_id)
+            self.store_link(new_link, sender_id)
 
         return True if new_link else False
 
+    def send_current_mst(self, message_id, neighbor_id):
+        """
+        Send the neighbor the links of this node's MST it does not know about yet. Links are only ever appended to MST,
+        so for every neighbor it is enough to remember how many of the first links it already knows about (either
+        sent to it or received from it) and only send the links after them. Nothing is sent if the neighbor knows
+        about all of them, since it would only find every link already in its MST or not relevant to it again.
+        :param message_id: The ID of the message to be sent
+        :param neighbor_id: The ID of the neighbor
+        """
+        mst = self.get_mst()
+        shared = self.shared_links.get(neighbor_id, 0)
+        if shared < len(mst):
+            self.send_neighbor(message_id, Message(MY_CURRENT_MST, mst[shared:]), neighbor_id)
+            self.shared_links[neighbor_id] = len(mst)
+
+    def store_link(self, link, sender_id=None):
+        """
+        Add the link into this node's MST. Together with the list of links node keeps the following indexes of MST:
+            - The set of links, each in the form (smaller node ID, bigger node ID)
+            - The set of IDs of all nodes present in the links
+            - The IDs of the neighbors this node has a link with, in the order the links were added
+            - The number of the first links every neighbor knows about (see send_current_mst)
+        Node keeping its neighbors in the compact store only keeps the IDs of the neighbors (see index_mst).
+        :param link: The link to be added. If it is a link from this node, this node's ID must be presented first
+        :param sender_id: The ID of the neighbor that sent this link, if any. It knows about the link already
+        """
+        if self.mst is None:
+            self.tree_neighbors.append(link[1])
+            count = len(self.tree_neighbors)
+        else:
+            self.mst.append(link)
+            self.mst_links.add((min(link), max(link)))
+            self.mst_nodes.update(link)
+            if link[0] == self.node_id:
+                self.tree_neighbors.append(link[1])
+            count = len(self.mst)
+        if sender_id is not None and self.shared_links.get(sender_id, 0) == count - 1:
+            self.shared_links[sender_id] = count
+
+    def index_mst(self, links):
+        """
+        Replace this node's MST with the given links and build the indexes of it again.
+        If the neighbors are kept in the compact store (see topologyStore.py), MST is kept there as well: the node only
+            keeps its own links, as the ranks of the links in its row of the store (see topologyStore.TreeView), and
+            the links between its neighbors are forgotten. Neighbors the node has no link with are then only known to
+            be in its connected component once they reject the test (see test_cheapest_link).
+        :param links: The links of new MST
+        """
+        self.tree_neighbors = get_tree(self.neighbors)
+        if isinstance(self.neighbors, NeighborView):
+            self.mst = None
+            self.mst_links = None
+            self.mst_nodes = self.tree_neighbors
+            links = [link for link in links if link[0] == self.node_id]
+        else:
+            self.mst = []
+            self.mst_links = set()
+            self.mst_nodes = set()
+        # Neighbors rebuild their MSTs at the same time, so nothing is known to be shared with them any more
+        self.shared_links = {}
+        for link in links:
+            self.store_link(link)
+
+    def get_mst(self):
+        """
+        :return: The links of this node's MST in the order they were added in (see store_link)
+        """
+        if self.mst is None:
+            return [(self.node_id, neighbor_id) for neighbor_id in self.tree_neighbors]
+        return self.mst
+
+    def knows_link(self, link):
+        """
+        :param link: Link in the form (node ID, neighbor ID)
+        :return: True if the link is in this node's MST
+        """
+        if self.mst is None:
+            if self.node_id not in link:
+                return False
+            return (link[1] if link[0] == self.node_id else link[0]) in self.tree_neighbors
+        return (min(link), max(link)) in self.mst_links
+
     def find_distance(self, position):
         """
         Find distance between two nodes.
@@ -317,12 +610,256 @@ class Node:
         """
         return math.sqrt((position[0] - self.position[0])**2 + (position[1] - self.position[1])**2)
 
-    def start_bcst(self, sender):
+    def start_bcst(self, senders, fragments=None):
         """
         Start broadcasting large volume data if the node is the one that initiates the broadcast.
         Otherwise just wait for neighbor messages.
-        :param sender: The ID of the node that initiates the broadcast.
+        Several broadcasts can be performed at the same time, each message tagged by the index of its broadcast. Node
+            floods them strictly in the given order (see forward_broadcasts), so that the energy is spent the same as
+            if they were performed one after another.
+        :param senders: The IDs of the nodes that initiate the broadcasts, in the order the broadcasts are performed in
+        :param fragments: Dictionary mapping the ID of every alive node to the ID of the leader of its connected
+                    component of MST (see MST.find_fragments). Only needed for more than one broadcast - then the
+                    node must know which of the broadcasts reach it
+        """
+        self.begin_bcst(senders, fragments)
+        self.receive_all()
+
+    def begin_bcst(self, senders, fragments=None):
+        """
+        Same as start_bcst, but only starts the action. Messages are then handled as they
+        are delivered (see deliver).
+        """
+        # Broadcasts reaching this node, the next one to flood last
+        self.broadcasts = [(bcst_id, sender) for bcst_id, sender in reversed(list(enumerate(senders)))
+                           if fragments is None or fragments[sender] == fragments[self.node_id]]
+        self.arrived = {}
+        self.receive_neighbor()
+        self.forward_broadcasts()
+
+    def forward_broadcasts(self):
+        """
+        Flood the data of every broadcast that is next in order and has already arrived to this node (or is initiated
+        by it). Data of a broadcast that arrives before the data of the broadcasts before it waits until these are
+        flooded.
+        """
+        while self.broadcasts:
+            bcst_id, sender = self.broadcasts[-1]
+            if sender == self.node_id:
+                except_nodes = None
+            elif bcst_id in self.arrived:
+                except_nodes = [self.arrived.pop(bcst_id)]
+            else:
+                return
+            self.broadcasts.pop()
+            self.flood_tree(bcst_id, message=DATA_BROADCAST_MESSAGE, except_nodes=except_nodes)
+
+    def grow_fragments(self, events_queue):
+        """
+        Find MST with asynchronous GHS algorithm instead of the levels run by the base station. Every node starts as
+        a fragment of level 0 and connects over its cheapest link. Fragments then find their cheapest outgoing links
+        (see test_basic_link and report) and connect over them on their own, each as soon as it can: a fragment is
+        absorbed by the fragment of higher level it connects to, or two fragments of the same level connecting over
+        the same link merge into a fragment of the level one higher, with that link as its core. Every fragment is
+        named by the weight of its core, links are compared by get_link_key, the same as the components of SynchGHS
+        and fastMST.kruskal compare them, so the same MST is found as by SynchGHS.
+        Node only keeps the links of MST from itself. It is done once no message is left (see MST.build_MST).
+        :param events_queue: Used only for logging the links the node connects over.
+        """
+        self.begin_grow_fragments(events_queue)
+        self.receive_all()
+
+    def begin_grow_fragments(self, events_queue):
+        """
+        Same as grow_fragments, but only starts the action. Messages are then handled as they
+        are delivered (see deliver).
+        """
+        self.events_queue = events_queue
+        self.level = 0
+        self.fragment = None
+        self.searching = False
+        self.find_count = 0
+        self.in_branch = None
+        self.best_link = None
+        self.best_weight = NO_LINK
+        self.test_link = None
+        self.rejected = set()
+        self.deferred = []
+        self.stage = Node.on_asynchronous_message
+        neighbor_id = self.find_basic_link()
+        if neighbor_id is not None:
+            self.connect(neighbor_id)
+
+    def on_asynchronous_message(self, envelope):
+        communication_type, message_id, message, sender_id = envelope
+        if communication_type == BEACON:
+            self.stage = None
+            return
+        # Messages the node is not ready for at its current level or state are put aside until the node changes
+        # either of them. They stay counted as not done with until then
+        if not self.asynchronous_handlers[message.type](self, message_id, message, sender_id):
+            self.in_flight.add()
+            self.deferred.append(envelope)
+            if metrics.enabled:
+                metrics.requeued('asynchronous')
+            return
+        while self.deferred:
+            deferred, self.deferred = self.deferred, []
+            for envelope in deferred:
+                communication_type, message_id, message, sender_id = envelope
+                if self.asynchronous_handlers[message.type](self, message_id, message, sender_id):
+                    self.in_flight.finish()
+                else:
+                    self.deferred.append(envelope)
+            if len(self.deferred) == len(deferred):
+                break
+
+    def get_link_weight(self, neighbor_id):
         """
-        if self.node_id == sender:
-            self.flood_tree(message={'type': 'data_broadcast'})
-        self.receive_neighbor()
\ No newline at end of file
+        :param neighbor_id: ID of the neighbor
+        :return: Weight of the link to the neighbor, the same at both ends of the link (see get_link_key)
+        """
+        return get_link_key((self.neighbors[neighbor_id][1], (self.node_id, neighbor_id)))
+
+    def find_basic_link(self):
+        """
+        Find the cheapest link that is neither in MST nor known to be within the fragment.
+        :return: ID of the neighbor on the other end of the link, None if there is no such link
+        """
+        while self.candidates and (self.candidates[0][1][1] in self.mst_nodes or
+                                   self.candidates[0][1][1] in self.rejected):
+            self.candidates.skip()
+        return self.candidates[0][1][1] if self.candidates else None
+
+    def connect(self, neighbor_id):
+        """
+        Add the cheapest outgoing link of the fragment into MST and ask the fragment on the other end to connect.
+        :param neighbor_id: ID of the neighbor on the other end of the link
+        """
+        self.store_link((self.node_id, neighbor_id))
+        self.events_queue.put(('log', (self.node_id, neighbor_id)))
+        self.send_neighbor(self.level, Message(CONNECT, self.level), neighbor_id)
+
+    def test_basic_link(self):
+        """
+        Ask the neighbor on the other end of the cheapest basic link if it is in another fragment. If there is no such
+        link, the node is done searching.
+        """
+        self.test_link = self.find_basic_link()
+        if self.test_link is not None:
+            self.send_neighbor(self.level, Message(TEST, (self.level, self.fragment)), self.test_link)
+        else:
+            self.report()
+
+    def report(self):
+        """
+        Report the cheapest outgoing link found in the part of the fragment behind this node towards the core, once
+        all the nodes behind it and the node itself are done searching.
+        """
+        if self.find_count == 0 and self.test_link is None:
+            self.searching = False
+            self.send_neighbor(self.level, Message(REPORT, self.best_weight), self.in_branch)
+
+    def change_root(self):
+        """
+        Pass the decision to connect towards the node with the cheapest outgoing link of the fragment, which then
+        connects over it.
+        """
+        if self.best_link in self.mst_nodes:
+            self.send_neighbor(self.level, CHANGE_ROOT_MESSAGE, self.best_link)
+        else:
+            self.connect(self.best_link)
+
+    # Every handler of asynchronous GHS messages returns False if the node is not ready for the message yet
+    def on_connect(self, message_id, message, sender_id):
+        if message.data < self.level:
+            # Fragment of lower level is absorbed into this one and searches for the cheapest link with it
+            self.store_link((self.node_id, sender_id))
+            self.send_neighbor(self.level, Message(INITIATE, (self.level, self.fragment, self.searching)), sender_id)
+            if self.searching:
+                self.find_count += 1
+        elif sender_id not in self.mst_nodes:
+            # Fragment of the same level can only merge with this one once this one connects over the same link
+            return False
+        else:
+            message = Message(INITIATE, (self.level + 1, self.get_link_weight(sender_id), True))
+            self.send_neighbor(self.level + 1, message, sender_id)
+        return True
+
+    def on_initiate(self, message_id, message, sender_id):
+        self.level, self.fragment, self.searching = message.data
+        self.in_branch = sender_id
+        self.best_link = None
+        self.best_weight = NO_LINK
+        self.flood_tree(self.level, message=message, except_nodes=[sender_id])
+        if self.searching:
+            self.find_count += len(self.tree_neighbors) - 1
+            self.test_basic_link()
+        return True
+
+    def on_asynchronous_test(self, message_id, message, sender_id):
+        level, fragment = message.data
+        if level > self.level:
+            # Node might be in the same fragment without knowing it yet
+            return False
+        if fragment != self.fragment:
+            self.send_neighbor(self.level, ACCEPT_MESSAGE, sender_id)
+            return True
+        self.rejected.add(sender_id)
+        if self.test_link != sender_id:
+            self.send_neighbor(self.level, REJECT_MESSAGE, sender_id)
+        else:
+            self.test_basic_link()
+        return True
+
+    def on_asynchronous_accept(self, message_id, message, sender_id):
+        self.test_link = None
+        weight = self.get_link_weight(sender_id)
+        if weight < self.best_weight:
+            self.best_link, self.best_weight = sender_id, weight
+        self.report()
+        return True
+
+    def on_asynchronous_reject(self, message_id, message, sender_id):
+        self.rejected.add(sender_id)
+        self.test_basic_link()
+        return True
+
+    def on_report(self, message_id, message, sender_id):
+        if sender_id != self.in_branch:
+            self.find_count -= 1
+            if message.data < self.best_weight:
+                self.best_link, self.best_weight = sender_id, message.data
+            self.report()
+        elif self.searching:
+            # Report from the other end of the core is only compared once this end is done searching
+            return False
+        elif message.data > self.best_weight:
+            self.change_root()
+        # If both ends of the core found no outgoing link, the fragment is the whole connected component
+        return True
+
+    def on_change_root(self, message_id, message, sender_id):
+        self.change_root()
+        return True
+
+    # Functions handling every type of the neighbor messages while waiting for the cheapest links
+    # (see receive_cheapest_link) and while waiting for all other messages (see receive_neighbor)
+    cheapest_link_handlers = {FIND_CHEAPEST_LINK: on_find_cheapest_link,
+                              MY_CHEAPEST_LINK: on_my_cheapest_link,
+                              TEST: on_test,
+                              ACCEPT: on_accept,
+                              REJECT: on_reject}
+    neighbor_handlers = {LINK_DECISION: on_link_decision,
+                         MY_CURRENT_MST: on_my_current_mst,
+                         ID_PROPOSAL: on_id_proposal,
+                         DATA_BROADCAST: on_data_broadcast,
+                         TEST: on_neighbor_test}
+    # Functions handling every type of the neighbor messages of asynchronous GHS (see grow_fragments)
+    asynchronous_handlers = {CONNECT: on_connect,
+                             INITIATE: on_initiate,
+                             TEST: on_asynchronous_test,
+                             ACCEPT: on_asynchronous_accept,
+                             REJECT: on_asynchronous_reject,
+                             REPORT: on_report,
+                             CHANGE_ROOT: on_change_root}
\ No newline at end of file
@@ -0,0 +1,201 @@
+from simulation import Simulation
+import MST
+import metrics
+import multiprocessing
+import subprocess
+import tempfile
+import shutil
+import random
+import json
+import math
+import time
+import os
+
+
+def generate_network(file_name, nodes, density, broadcasts, energy=(20.0, 60.0), energy_distribution='uniform',
+                     minimum_budget=5.0, seed=None):
+    """
+    Generate a random geometric network and write it into the file in the input format of fileParser.
+    Nodes are placed uniformly at random in a square, the size of which is chosen so that there are on average
+    the given number of nodes in every R x R area.
+    :param file_name: The file to write the network into
+    :param nodes: Number of nodes
+    :param density: Average number of nodes in every R x R area
+    :param broadcasts: Number of broadcasts, each from a randomly chosen node
+    :param energy: Range of the initial energies in the form (minimum, maximum) for uniform distribution or
+                (mean, standard deviation) for normal distribution
+    :param energy_distribution: Distribution of the initial energies - 'uniform' or 'normal'
+    :param minimum_budget: Minimum energy the node needs to stay alive
+    :param seed: Seed of the random number generator
+    """
+    generator = random.Random(seed)
+    side = MST.R * math.sqrt(float(nodes) / density)
+    f = open(file_name, 'w')
+    f.write('%r\n' % float(minimum_budget))
+    for node_id in range(1, nodes + 1):
+        if energy_distribution == 'normal':
+            node_energy = max(0.0, generator.gauss(*energy))
+        else:
+            node_energy = generator.uniform(*energy)
+        f.write('node %d, %r, %r, %r\n' % (node_id, generator.uniform(0, side), generator.uniform(0, side),
+                                             node_energy))
+    for _ in range(broadcasts):
+        f.write('bcst from %d\n' % generator.randint(1, nodes))
+    f.close()
+
+
+def run_case(file_name, engine, results, collect_metrics=False):
+    """
+    Run the whole network given in the file (same as main.py does) and time every part of it.
+    Done in a separate process, so every case starts from a clean state.
+    :param file_name: The file describing the network and the broadcasts
+    :param engine: 'distributed', 'events' or 'fast'
+    :param results: Queue to put the timings (in seconds), the number of performed broadcasts and alive nodes and
+                the metrics into
+    :param collect_metrics: Flag specifying if the metrics (see metrics.py) should be recorded. Recording them costs
+                time on every message sent, so the timings of such run are not the timings of the case (see benchmark)
+    """
+    timings = {}
+    result = {'timings': timings}
+    if collect_metrics:
+        metrics.enable()
+    simulation = Simulation(file_name, engine=engine)
+
+    start = time.time()
+    simulation.start()
+    timings['parse'] = time.time() - start
+    try:
+        start = time.time()
+        simulation.find_MST()
+        timings['find_MST'] = time.time() - start
+
+        start = time.time()
+        performed = simulation.perform_broadcasts()
+        timings['broadcasts'] = time.time() - start
+    finally:
+        simulation.stop()
+    result['broadcasts_performed'] = performed
+    result['nodes_alive'] = len(simulation.nodes)
+    if collect_metrics:
+        result['metrics'] = metrics.snapshot()
+    results.put(result)
+
+
+def get_commit():
+    """
+    :return: The git commit the code is at, None if it is not known
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(sizes, densities, broadcasts, engines, energy=(20.0, 60.0), energy_distribution='uniform',
+              repeats=1, timeout=600, seed=0, collect_metrics=False):
+    """
+    Run every combination of the given parameters on generated networks.
+    Timed runs never record the metrics. If asked for, every case that finished in time is run once more with the
+    metrics recorded, and only the metrics of that run are kept.
+    :param sizes: Numbers of nodes
+    :param densities: Average numbers of nodes in every R x R area
+    :param broadcasts: Numbers of broadcasts
+    :param engines: Engines to run ('distributed', 'events' and/or 'fast')
+    :param energy: Parameters of the initial energies (see generate_network)
+    :param energy_distribution: Distribution of the initial energies (see generate_network)
+    :param repeats: Number of times every combination is run, each time on a different network
+    :param timeout: Seconds after which the case is stopped
+    :param seed: Seed of the first generated network
+    :param collect_metrics: Flag specifying if the metrics (see metrics.py) of every case should be recorded
+    :return: List of results, one for every run
+    """
+    results = []
+    directory = tempfile.mkdtemp(prefix='mst-benchmark-')
+    working_directory = os.getcwd()
+    # Every case writes its log.txt into the temporary directory
+    os.chdir(directory)
+    try:
+        for nodes in sizes:
+            for density in densities:
+                for broadcast_count in broadcasts:
+                    for repeat in range(repeats):
+                        case_seed = seed + repeat
+                        file_name = os.path.join(directory, 'network-%d-%s-%d-%d.txt'
+                                                 % (nodes, density, broadcast_count, case_seed))
+                        generate_network(file_name, nodes, density, broadcast_count, energy, energy_distribution,
+                                         seed=case_seed)
+                        for engine in engines:
+                            result = {'nodes': nodes, 'density': density, 'broadcasts': broadcast_count,
+                                      'engine': engine, 'seed': case_seed, 'energy': list(energy),
+                                      'energy_distribution': energy_distribution}
+                            result.update(run_with_timeout(file_name, engine, timeout))
+                            if collect_metrics and result['status'] == 'ok':
+                                result['metrics'] = run_with_timeout(file_name, engine, timeout,
+                                                                     collect_metrics=True).get('metrics')
+                            results.append(result)
+    finally:
+        os.chdir(working_directory)
+        shutil.rmtree(directory)
+    return results
+
+
+def run_with_timeout(file_name, engine, timeout, collect_metrics=False):
+    """
+    Run a single case in a new process.
+    :param file_name: The file describing the network and the broadcasts
+    :param engine: 'distributed', 'events' or 'fast'
+    :param timeout: Seconds after which the process is stopped
+    :param collect_metrics: Flag specifying if the metrics should be recorded (see run_case)
+    :return: Dictionary with the status of the run ('ok', 'timeout' or 'failed'), its total time and the results
+            of run_case
+    """
+    if os.path.exists('log.txt'):
+        os.remove('log.txt')
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=(file_name, engine, queue, collect_metrics))
+    start = time.time()
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return {'status': 'timeout', 'total': time.time() - start}
+    if queue.empty():
+        return {'status': 'failed', 'total': time.time() - start}
+    result = queue.get()
+    result.update({'status': 'ok', 'total': time.time() - start})
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark MST and broadcasts on generated networks.')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='Numbers of nodes')
+    parser.add_argument('--density', type=float, nargs='+', default=[2.0],
+                        help='Average numbers of nodes in every R x R area')
+    parser.add_argument('--broadcasts', type=int, nargs='+', default=[10], help='Numbers of broadcasts')
+    parser.add_argument('--engine', choices=['distributed', 'events', 'fast'], nargs='+', default=['fast'],
+                        help='Engines to benchmark')
+    parser.add_argument('--energy', type=float, nargs=2, default=[20.0, 60.0],
+                        help='Minimum and maximum (uniform) or mean and standard deviation (normal) of the energies')
+    parser.add_argument('--energy-distribution', choices=['uniform', 'normal'], default='uniform')
+    parser.add_argument('--repeats', type=int, default=1, help='Number of networks generated for every combination')
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds after which a run is stopped')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first generated network')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Also record the metrics of every case (see metrics.py) in a second run, which is not '
+                             'timed')
+    parser.add_argument('--output', default='benchmark.json', help='File to write the results into')
+    options = parser.parse_args()
+
+    results = benchmark(options.nodes, options.density, options.broadcasts, options.engine,
+                        tuple(options.energy), options.energy_distribution, options.repeats, options.timeout,
+                        options.seed, options.metrics)
+    f = open(options.output, 'w')
+    json.dump({'commit': get_commit(), 'time': time.time(), 'results': results}, f, indent=2, sort_keys=True)
+    f.close()
+    for result in results:
+        print('%(engine)s, %(nodes)d nodes, density %(density)s, %(broadcasts)d broadcasts: %(status)s in %(total).3fs'
+              % result)
@@ -0,0 +1,202 @@
+import struct
+import mmap
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Every record is the type of the event, two node IDs and a value: 17 bytes, no padding
+RECORD = struct.Struct('<Biid')
+
+# Types of the records. Line 'bs ...' is a LEADERS record holding the number of the leaders, followed by a LEADER
+# record for each of them
+LEADERS = 1
+LEADER = 2
+ADDED = 3
+ELECTED = 4
+DOWN = 5
+DATA = 6
+
+TYPE_NAMES = {'bs': LEADERS, 'added': ADDED, 'elected': ELECTED, 'down': DOWN, 'data': DATA}
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype([('type', '<u1'), ('first', '<i4'), ('second', '<i4'), ('value', '<f8')])
+
+
+def leaders_records(leader_ids):
+    return [(LEADERS, len(leader_ids), 0, 0.0)] + [(LEADER, leader_id, 0, 0.0) for leader_id in leader_ids]
+
+
+def pack(records):
+    """
+    :param records: Records of a single line in the form (type, first node ID, second node ID, value)
+    :return: The records as written into the trace
+    """
+    return ''.join(RECORD.pack(*record) for record in records)
+
+
+def format_line(records):
+    """
+    Get the line of the text log (without the new line) the records stand for, the same as logProducer.py writes it.
+    :param records: Records of a single line
+    :return: The line
+    """
+    record_type, first, second, value = records[0]
+    if record_type == LEADERS:
+        return 'bs %s' % ','.join(str(leader_id) for _, leader_id, _, _ in records[1:])
+    if record_type == ADDED:
+        return 'added %s-%s' % (first, second)
+    if record_type == ELECTED:
+        return 'elected %s' % first
+    if record_type == DOWN:
+        return 'node down %s' % first
+    if record_type == DATA:
+        return 'data from %s to %s, energy:%s' % (first, second, value)
+    raise ValueError('Unknown record type %d' % record_type)
+
+
+def parse_line(line):
+    """
+    Get the records of a line of the text log (see mstCache.py, which keeps the lines).
+    :param line: The line without the new line
+    :return: Records of the line
+    """
+    if line.startswith('bs '):
+        return leaders_records([int(leader_id) for leader_id in line[3:].split(',') if leader_id])
+    if line.startswith('added '):
+        first, second = line[6:].split('-')
+        return [(ADDED, int(first), int(second), 0.0)]
+    if line.startswith('elected '):
+        return [(ELECTED, int(line[8:]), 0, 0.0)]
+    if line.startswith('node down '):
+        return [(DOWN, int(line[10:]), 0, 0.0)]
+    if line.startswith('data from '):
+        transfer, energy = line[10:].split(', energy:')
+        first, second = transfer.split(' to ')
+        return [(DATA, int(first), int(second), float(energy))]
+    raise ValueError('Unknown line %r' % line)
+
+
+def map_file(file_name):
+    """
+    :param file_name: The trace file
+    :return: The whole trace memory-mapped, empty string for an empty file
+    """
+    f = open(file_name, 'rb')
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can not be memory-mapped
+        return ''
+    finally:
+        f.close()
+
+
+def read_lines(file_name):
+    """
+    Iterate over the lines of the trace.
+    :param file_name: The trace file
+    :return: Iterator over the records of every line
+    """
+    trace = map_file(file_name)
+    count = len(trace) // RECORD.size
+    index = 0
+    while index < count:
+        records = [RECORD.unpack_from(trace, index * RECORD.size)]
+        index += 1
+        if records[0][0] == LEADERS:
+            records.extend(RECORD.unpack_from(trace, (index + number) * RECORD.size)
+                           for number in range(records[0][1]))
+            index += records[0][1]
+        yield records
+
+
+def touches(records, node_id):
+    """
+    :param records: Records of a single line
+    :param node_id: ID of the node
+    :return: True if the line is about the node - the node is one of the leaders, either end of the link or data
+            transfer, or the node elected or dead
+    """
+    record_type, first, second, _ = records[0]
+    if record_type == LEADERS:
+        return any(leader_id == node_id for _, leader_id, _, _ in records[1:])
+    return first == node_id or (second == node_id and record_type in (ADDED, DATA))
+
+
+def find_lines(file_name, node_id=None, types=None):
+    """
+    Find the lines of the trace about the given node and of the given types.
+    :param file_name: The trace file
+    :param node_id: ID of the node, None for the lines about any node
+    :param types: Types of the lines (LEADERS for 'bs' lines), None for all types
+    :return: Iterator over the records of every matching line, in the order they were logged
+    """
+    if numpy is not None and node_id is not None:
+        return find_lines_numpy(file_name, node_id, types)
+    return (records for records in read_lines(file_name)
+            if (types is None or records[0][0] in types) and (node_id is None or touches(records, node_id)))
+
+
+def find_lines_numpy(file_name, node_id, types=None):
+    """
+    Same as find_lines, but all the records are looked at at once by NumPy, so only the matching lines are read one
+    by one.
+    """
+    trace = map_file(file_name)
+    if not trace:
+        return
+    records = numpy.frombuffer(trace, dtype=RECORD_DTYPE, count=len(trace) // RECORD.size)
+    record_types = records['type']
+    matching = ((records['first'] == node_id) & (record_types != LEADERS)) | \
+               ((records['second'] == node_id) & ((record_types == ADDED) | (record_types == DATA)))
+    # Leaders are matched in the LEADER records, the line starts with the last LEADERS record before them
+    line_starts = numpy.flatnonzero(record_types == LEADERS)
+    indexes = numpy.flatnonzero(matching)
+    leader_indexes = indexes[record_types[indexes] == LEADER]
+    indexes = numpy.union1d(indexes[record_types[indexes] != LEADER],
+                            line_starts[numpy.searchsorted(line_starts, leader_indexes, 'right') - 1])
+    for index in indexes.tolist():
+        record = RECORD.unpack_from(trace, index * RECORD.size)
+        if types is not None and record[0] not in types:
+            continue
+        line = [record]
+        if record[0] == LEADERS:
+            line.extend(RECORD.unpack_from(trace, (index + number) * RECORD.size) for number in range(1, record[1] + 1))
+        yield line
+
+
+def convert(file_name, output, node_id=None, types=None):
+    """
+    Write the lines of the trace as the text log - exactly the same as the text log of the same run would be.
+    :param file_name: The trace file
+    :param output: Opened file to write the lines into
+    :param node_id: Only write the lines about the node (see find_lines)
+    :param types: Only write the lines of the given types
+    """
+    batch = []
+    for records in find_lines(file_name, node_id, types):
+        batch.append(format_line(records) + '\n')
+        if len(batch) == 4096:
+            output.write(''.join(batch))
+            batch = []
+    output.write(''.join(batch))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Turn the binary trace of a run (see main.py --trace) into the text '
+                                                 'log, optionally only the lines about a single node.')
+    parser.add_argument('trace', help='The trace file')
+    parser.add_argument('--output', help='File to write the text log into. Standard output by default')
+    parser.add_argument('--node', type=int, help='Only the lines about the node with this ID')
+    parser.add_argument('--type', choices=sorted(TYPE_NAMES), nargs='+', help='Only the lines of these types')
+    options = parser.parse_args()
+
+    output = open(options.output, 'w') if options.output else sys.stdout
+    types = set(TYPE_NAMES[name] for name in options.type) if options.type else None
+    convert(options.trace, output, options.node, types)
+    if options.output:
+        output.close()
@@ -0,0 +1,94 @@
+from logProducer import data_sent
+from energyStore import EnergyStore, numpy
+
+
+class BroadcastScheduler:
+    """
+    Performs the broadcasts without simulating the nodes. Broadcast floods the data over MST, so the data transfers
+    (who sends to whom and the energy it costs) only depend on the sender and MST. They are found once for every sender
+    and reused by all the broadcasts from it until MST changes, then every broadcast only needs to account the energy
+    and log the transfers. If NumPy is installed, the energies are accounted in an EnergyStore kept until MST changes.
+    """
+
+    def __init__(self):
+        self.plans = {}
+        self.store = None
+
+    def invalidate(self):
+        """
+        Forget all the data transfers found so far and the energies kept in the store. Must be called every time MST
+        changes.
+        """
+        self.plans.clear()
+        self.store = None
+
+    def get_plan(self, nodes, sender):
+        """
+        Find the data transfers of the broadcast from the sender. Every node sends the data to all its neighbors in MST
+        except the one it got the data from, in the same order as Node.flood_tree does.
+        :param nodes: List of all alive nodes
+        :param sender: The ID of the node that initiates the broadcast
+        :return: List of data transfers in the form (sending node, receiving node ID, energy spent) in the order they
+                are performed and the list of all the nodes reached by the broadcast
+        """
+        plan = self.plans.get(sender)
+        if plan is not None:
+            return plan
+        by_id = dict((node.node_id, node) for node in nodes)
+        transfers, reached = [], []
+        to_visit = [(sender, None)]
+        for node_id, parent_id in to_visit:
+            node = by_id[node_id]
+            reached.append(node)
+            for neighbor_id in node.tree_neighbors:
+                if neighbor_id == parent_id:
+                    continue
+                # Distance is found from the positions, since nodes run by other processes (see shardedBackend.py)
+                # do not share their neighbors with base station
+                transfers.append((node, neighbor_id, node.find_distance(by_id[neighbor_id].position)*1.2))
+                to_visit.append((neighbor_id, node_id))
+        plan = (transfers, reached)
+        self.plans[sender] = plan
+        return plan
+
+    def broadcast(self, nodes, sender):
+        """
+        Perform a broadcast from the sender: update the energy of every sending node, log every data transfer and mark
+        the nodes whose energy dropped below the minimum budget as not alive, same as if the nodes flooded the data.
+        :param nodes: List of all alive nodes
+        :param sender: The ID of the node that initiates the broadcast
+        :return: True if any of the nodes died, meaning MST needs to be repaired before the next broadcast
+        """
+        if numpy is not None:
+            if self.store is None:
+                self.store = EnergyStore(nodes)
+            return self.store.broadcast(self.get_plan(nodes, sender), nodes[0].minimum_budget)
+
+        transfers, reached = self.get_plan(nodes, sender)
+        for node, receiver_id, cost in transfers:
+            node.energy -= cost
+            data_sent(node.node_id, receiver_id, node.energy)
+        died = False
+        for node in reached:
+            if node.energy < node.minimum_budget:
+                node.alive = False
+                died = True
+        return died
+
+    def count_until_death(self, nodes, senders):
+        """
+        Find how many of the broadcasts (from the first one) can be performed before MST needs to be repaired - all of
+        them up to the first one after which some node dies. Nodes are not changed, only their energies are accounted.
+        :param nodes: List of all alive nodes
+        :param senders: The IDs of the nodes that initiate the broadcasts, in the order of the broadcasts
+        :return: The number of the broadcasts
+        """
+        energies = {}
+        for count, sender in enumerate(senders, 1):
+            transfers, reached = self.get_plan(nodes, sender)
+            for node, receiver_id, cost in transfers:
+                energies[node.node_id] = energies.get(node.node_id, node.energy) - cost
+            for node in reached:
+                if energies.get(node.node_id, node.energy) < node.minimum_budget:
+                    return count
+        return len(senders)
@@ -0,0 +1,199 @@
+from messages import BEACON, BEACON_MESSAGE
+import metrics
+import collections
+import itertools
+import heapq
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+# Actions that handle messages are only started, the messages are then delivered by the backend (see Node.deliver)
+BEGIN_ACTIONS = {'discover_response': 'begin_discover_response',
+                 'choose_best_link': 'begin_choose_best_link',
+                 'merge': 'begin_merge',
+                 'start_bcst': 'begin_bcst',
+                 'grow_fragments': 'begin_grow_fragments'}
+
+
+class EventMailbox:
+    """
+    Message queue of a node run by the discrete-event backend. Putting a message into it does not keep the message,
+    it schedules the delivery of the message to the node instead.
+    """
+
+    def __init__(self, backend, node_id):
+        """
+        :param backend: Backend delivering the messages
+        :param node_id: ID of the node this mailbox belongs to
+        """
+        self.backend = backend
+        self.node_id = node_id
+
+    def put(self, message):
+        self.backend.schedule(self.node_id, message)
+
+
+class Uncounted:
+    """
+    Stands in for the message counter (see messageCounter.py) of the nodes run by the discrete-event backend. Phase
+    is over then no event is left, so the messages do not need to be counted.
+    """
+
+    def add(self, count=1):
+        pass
+
+    def finish(self):
+        pass
+
+
+def get_sender(message):
+    """
+    :param message: Message put into the message queue of some node
+    :return: ID of the node that sent the message, None for the beacons of the base station
+    """
+    if message[0] == BEACON:
+        return None
+    # Discover messages are routed by the base station, but they are sent by the discovering node
+    return message[1] if len(message) == 3 else message[3]
+
+
+def mix(value):
+    """
+    Scramble the bits of a 64-bit integer (finalizer of SplitMix64), so that close integers give unrelated results.
+    :param value: 64-bit integer
+    :return: Scrambled 64-bit integer
+    """
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def link_latency(latency=0.0, spread=0.0, seed=0):
+    """
+    Make the function giving the time it takes a message to travel over a link. Every link gets its own latency
+    between latency and latency + spread, the same in both directions and the same in every run with the same seed.
+    Latencies are computed from the IDs of the nodes and the seed, so nothing has to be kept for every link.
+    :param latency: The lowest latency of a link in seconds
+    :param spread: How much higher than the lowest latency the latency of a link can be
+    :param seed: Seed choosing the latencies of the links
+    :return: Function taking the IDs of the sender and the receiver and returning the latency in seconds
+    """
+    if not spread:
+        return lambda sender_id, receiver_id: latency
+
+    def get_latency(sender_id, receiver_id):
+        value = mix(seed & MASK)
+        value = mix(value ^ min(sender_id, receiver_id))
+        value = mix(value ^ max(sender_id, receiver_id))
+        return latency + spread * value / float(MASK + 1)
+
+    return get_latency
+
+
+class DiscreteEventBackend:
+    """
+    Runs all the nodes in this process in a single thread, without any worker threads or locks. Every message sent
+    is an event scheduled at the virtual time it arrives to the node (the time it was sent plus the latency of the
+    link), and events are handled strictly in the order of their times - the order they were scheduled in if the
+    times are equal. Nodes run the same protocol as with the worker threads, one message at the time (see
+    Node.deliver), so the runs are the same every time and only limited by the memory needed for the nodes.
+    Base station sends its beacon once there is no event left.
+    """
+    # Nodes stay in this process, so MST found by them can be cached (see MST.find_MST)
+    nodes_in_process = True
+
+    def __init__(self, nodes, latency=0.0, spread=0.0, seed=0):
+        """
+        :param nodes: List of all known nodes
+        :param latency: The lowest latency of a link in seconds (see link_latency)
+        :param spread: How much higher than the lowest latency the latency of a link can be
+        :param seed: Seed choosing the latencies of the links
+        """
+        self.latency = latency
+        self.link_latency = link_latency(latency, spread, seed)
+        # With the same latency on every link messages arrive in the order they are sent, so no heap is needed
+        self.ordered = not spread
+        self.clock = 0.0
+        self.events = collections.deque() if self.ordered else []
+        self.sequence = itertools.count()
+        self.uncounted = Uncounted()
+        self.add_nodes([], nodes)
+
+    def add_nodes(self, nodes, new_nodes):
+        """
+        Let the backend deliver the messages to the new nodes.
+        :param nodes: List of the nodes already run by the backend
+        :param new_nodes: List of the new nodes
+        """
+        for node in new_nodes:
+            node.message_queue[node.node_id] = self.mailbox(node.node_id)
+            node.in_flight = self.uncounted
+
+    def mailbox(self, node_id):
+        """
+        Get the message queue the nodes and the base station should use to send messages to the given node.
+        :param node_id: ID of the node
+        :return: Mailbox of the node
+        """
+        return EventMailbox(self, node_id)
+
+    def schedule(self, node_id, message):
+        """
+        Schedule delivery of the message to the node once it travels over the link from its sender.
+        :param node_id: ID of the receiving node
+        :param message: The message
+        """
+        if self.ordered:
+            self.events.append((self.clock + self.latency, node_id, message))
+            return
+        sender_id = get_sender(message)
+        time = self.clock if sender_id is None else self.clock + self.link_latency(sender_id, node_id)
+        heapq.heappush(self.events, (time, next(self.sequence), node_id, message))
+
+    def alert_all(self, nodes, action, args=(), handle=False, handle_message=BEACON_MESSAGE):
+        """
+        Same as MST.alert_all, but the nodes perform the action one after another. If the action handles messages,
+        every node only starts it and then the messages are delivered until there is none left.
+        """
+        if not handle:
+            for node in nodes:
+                getattr(node, action)(*args)
+            return
+
+        start = self.clock
+        begin = BEGIN_ACTIONS[action]
+        for node in nodes:
+            getattr(node, begin)(*args)
+        self.run(dict((node.node_id, node) for node in nodes))
+
+        for node in nodes:
+            node.deliver(handle_message)
+
+        if metrics.enabled:
+            metrics.phase_simulated(action, self.clock - start)
+
+    def run(self, nodes):
+        """
+        Deliver the scheduled messages in the order of their arrival until no node sends anything new.
+        :param nodes: Dictionary mapping node ID to the node
+        """
+        events = self.events
+        if self.ordered:
+            while events:
+                self.clock, node_id, message = events.popleft()
+                nodes[node_id].deliver(message)
+        else:
+            while events:
+                self.clock, _, node_id, message = heapq.heappop(events)
+                nodes[node_id].deliver(message)
+
+    def clean(self, nodes):
+        """
+        Nothing is kept for the nodes apart from their mailboxes, which are replaced by MST.clean.
+        """
+        pass
+
+    def stop(self):
+        """
+        Forget everything still scheduled.
+        """
+        self.events = collections.deque() if self.ordered else []
@@ -0,0 +1,69 @@
+from logProducer import data_sent
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class EnergyStore:
+    """
+    Energies of the nodes kept in a single NumPy array, so that the energy spent by all the nodes during a broadcast
+    over MST can be accounted at once instead of one data transfer at the time. The data transfers of every broadcast
+    are found by BroadcastScheduler.get_plan. Requires NumPy to be installed.
+    """
+
+    def __init__(self, nodes):
+        """
+        :param nodes: List of all alive nodes. MST must already be found and must not change while the store is used
+        """
+        self.nodes = list(nodes)
+        self.index = dict((node.node_id, index) for index, node in enumerate(self.nodes))
+        self.energies = numpy.array([node.energy for node in self.nodes], dtype=numpy.float64)
+
+    def get_arrays(self, plan):
+        """
+        :param plan: Data transfers of the broadcast as returned by BroadcastScheduler.get_plan
+        :return: Tuple of arrays: indexes of the sending nodes, IDs of the receiving nodes, energy spent by every
+                transfer, number of the transfer among all transfers of its sender and indexes of all reached nodes
+        """
+        transfers, reached = plan
+        count = len(transfers)
+        index = self.index
+        senders = numpy.fromiter((index[node.node_id] for node, _, _ in transfers), dtype=numpy.intp, count=count)
+        costs = numpy.fromiter((cost for _, _, cost in transfers), dtype=numpy.float64, count=count)
+        # Every node performs all its transfers one after another, so the transfers are numbered within every run of
+        # the same sending node
+        starts = numpy.flatnonzero(numpy.concatenate(([True], senders[1:] != senders[:-1])))
+        rounds = numpy.arange(count) - numpy.repeat(starts, numpy.diff(numpy.append(starts, count)))
+        return (senders, [receiver_id for _, receiver_id, _ in transfers], costs, rounds,
+                numpy.fromiter((index[node.node_id] for node in reached), dtype=numpy.intp, count=len(reached)))
+
+    def broadcast(self, plan, minimum_budget):
+        """
+        Perform a broadcast. Every sender's energy is decreased transfer by transfer (so the energies are exactly the
+        same as if every node updated its own energy), but the k-th transfers of all senders are accounted at once.
+        Data transfers are then logged in the same order as they happen during the broadcast.
+        Nodes whose energy dropped below the minimum budget are marked as not alive.
+        :param plan: Data transfers of the broadcast as returned by BroadcastScheduler.get_plan
+        :param minimum_budget: Minimum energy the node needs to stay alive
+        :return: True if any of the nodes died, meaning MST needs to be repaired before the next broadcast
+        """
+        senders, receivers, costs, rounds, reached = self.get_arrays(plan)
+        energies_after = numpy.empty(len(costs))
+        for number in range(rounds.max() + 1 if len(rounds) else 0):
+            transfers = numpy.flatnonzero(rounds == number)
+            self.energies[senders[transfers]] -= costs[transfers]
+            energies_after[transfers] = self.energies[senders[transfers]]
+
+        for sender_index, receiver_id, energy in zip(senders.tolist(), receivers, energies_after.tolist()):
+            data_sent(self.nodes[sender_index].node_id, receiver_id, energy)
+
+        # Keep the nodes up to date, so that nothing else needs to know about the store
+        changed = numpy.unique(senders)
+        for index, energy in zip(changed.tolist(), self.energies[changed].tolist()):
+            self.nodes[index].energy = energy
+        dead = reached[self.energies[reached] < minimum_budget]
+        for index in dead.tolist():
+            self.nodes[index].alive = False
+        return len(dead) > 0
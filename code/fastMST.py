@@ -0,0 +1,210 @@
+from logProducer import alert_leaders_to_start_level, new_leaders_elected, new_links_added, nodes_dead
+from MST import build_grid, nearby_nodes, find_distance, find_root, find_tree_link_order, find_fragments, \
+    find_new_links, insert_links, clean, R
+from Node import get_link_key
+from broadcastScheduler import BroadcastScheduler
+import Queue
+
+# Data transfers of the broadcasts over MST found by find_MST, applied to the energy store or to the nodes themselves
+scheduler = BroadcastScheduler()
+
+
+def find_edges(nodes):
+    """
+    Find all links of the network, i.e. all pairs of nodes within the distance R from each other.
+    :param nodes: List of all known nodes
+    :return: List of links in the form (distance, (smaller node ID, bigger node ID))
+    """
+    grid = build_grid(nodes)
+    edges = []
+    for node in nodes:
+        for other in nearby_nodes(grid, node.position):
+            if other.node_id <= node.node_id:
+                continue
+            distance = find_distance(node.position, other.position)
+            if distance <= R:
+                edges.append((distance, (node.node_id, other.node_id)))
+    return edges
+
+
+def kruskal(nodes, edges=None):
+    """
+    Find MST (or minimum spanning forest if network is not connected) with Kruskal's algorithm.
+    Links are compared as (distance, link) tuples, the same way nodes compare them (see Node.get_link_key).
+    :param nodes: List of all known nodes
+    :param edges: Links of the network as returned by find_edges. Found from the nodes if not given
+    :return: List of links in MST in the form (distance, (smaller node ID, bigger node ID))
+    """
+    parents = dict((node.node_id, node.node_id) for node in nodes)
+    mst = []
+    for distance, link in sorted(edges if edges is not None else find_edges(nodes)):
+        root_one, root_two = find_root(parents, link[0]), find_root(parents, link[1])
+        if root_one != root_two:
+            parents[root_one] = root_two
+            mst.append((distance, link))
+    return mst
+
+
+def find_MST(nodes, need_logging=False):
+    """
+    Find MST centrally instead of simulating the SynchGHS algorithm. MST is found with Kruskal's algorithm and the
+    levels of SynchGHS are then replayed over the links of MST only (at every level each connected component adds
+    its cheapest outgoing link), so that the same leaders, links and elected nodes are logged.
+    Nodes are left in the same state as after the distributed algorithm: neighbors are known, MST links from every
+    node are in node's MST and leaders are the nodes with the biggest ID in every connected component.
+    :param nodes: List of all known nodes
+    :param need_logging: Flag specifying if logging is required
+    """
+    scheduler.invalidate()
+    edges = find_edges(nodes)
+    for node in nodes:
+        node.clean()
+    by_id = dict((node.node_id, node) for node in nodes)
+    for _, (node_one, node_two) in edges:
+        by_id[node_one].update_neighbors(node_two, by_id[node_two].position)
+        by_id[node_two].update_neighbors(node_one, by_id[node_one].position)
+
+    replay_levels(nodes, kruskal(nodes, edges), dict((node.node_id, node.node_id) for node in nodes), need_logging)
+    finish_MST(nodes)
+
+
+def join_nodes(nodes, new_nodes, need_logging=False):
+    """
+    Same as MST.join_nodes, but MST is updated centrally: the links of the new nodes are inserted into MST (see
+    MST.insert_links) and the levels of SynchGHS are replayed from the fragments left of the old MST.
+    :param nodes: The list of existing alive nodes
+    :param new_nodes: The list of the new nodes
+    :param need_logging: Flag specifying if logging is required
+    :return: The list of all alive nodes, the new ones after the existing ones
+    """
+    scheduler.invalidate()
+    all_nodes = nodes + new_nodes
+    by_id = dict((node.node_id, node) for node in all_nodes)
+    new_links = find_new_links(nodes, new_nodes)
+    for _, (node_one, node_two) in new_links:
+        by_id[node_one].update_neighbors(node_two, by_id[node_two].position)
+        by_id[node_two].update_neighbors(node_one, by_id[node_one].position)
+
+    old_links = set((min(node.node_id, neighbor_id), max(node.node_id, neighbor_id))
+                    for node in nodes for neighbor_id in node.tree_neighbors)
+    mst = insert_links(all_nodes, new_links)
+    fragments = find_fragments(all_nodes, (), old_links - set(link for _, link in mst))
+    for node in all_nodes:
+        node.keep_fragment(fragments)
+    # New nodes without any neighbors stay on their own and the rest of MST does not change
+    if new_links:
+        replay_levels(all_nodes, mst, dict((node.node_id, fragments[node.node_id]) for node in all_nodes),
+                      need_logging)
+    finish_MST(all_nodes)
+    return all_nodes
+
+
+def replay_levels(nodes, mst, parents, need_logging=False):
+    """
+    Replay the levels of SynchGHS over the links of MST only, starting from the given connected components, and put
+    the links into the nodes the same way the nodes would add them.
+    :param nodes: List of all known nodes, the leader of every connected component is the node with the biggest ID
+    :param mst: List of links in MST in the form (distance, (smaller node ID, bigger node ID))
+    :param parents: Dictionary mapping node ID to the parent node ID within its connected component (see
+                MST.find_root), the leader of every connected component is its representative
+    :param need_logging: Flag specifying if logging is required
+    """
+    by_id = dict((node.node_id, node) for node in nodes)
+    while True:
+        alert_leaders_to_start_level(nodes, need_logging)
+        # Every connected component chooses its cheapest link going out of the component
+        cheapest = {}
+        for distance, (node_one, node_two) in mst:
+            root_one, root_two = find_root(parents, node_one), find_root(parents, node_two)
+            if root_one == root_two:
+                continue
+            for root, link in ((root_one, (node_one, node_two)), (root_two, (node_two, node_one))):
+                if root not in cheapest or get_link_key((distance, link)) < get_link_key(cheapest[root]):
+                    cheapest[root] = (distance, link)
+        # If no more new links added - terminate, MST is found.
+        if not cheapest:
+            break
+
+        chosen = [cheapest[find_root(parents, node.node_id)][1] for node in nodes
+                  if node.leader and find_root(parents, node.node_id) in cheapest]
+        links_queue = Queue.Queue()
+        for link in chosen:
+            links_queue.put(('log', link))
+        new_links_added(links_queue, need_logging)
+
+        for node_one, node_two in chosen:
+            # Two components might have chosen the same link
+            if by_id[node_one].knows_link((node_one, node_two)):
+                continue
+            by_id[node_one].store_link((node_one, node_two))
+            by_id[node_two].store_link((node_two, node_one))
+            parents[find_root(parents, node_one)] = find_root(parents, node_two)
+
+        # Node with the biggest ID in every merged component becomes the new leader
+        biggest = {}
+        merged = {}
+        for node in nodes:
+            if node.leader:
+                root = find_root(parents, node.node_id)
+                biggest[root] = max(biggest.get(root, node.node_id), node.node_id)
+                merged[root] = merged.get(root, 0) + 1
+        for node in nodes:
+            root = find_root(parents, node.node_id)
+            node.elected = node.leader and node.node_id == biggest[root] and merged[root] > 1
+            node.leader = node.leader and node.node_id == biggest[root]
+        new_leaders_elected(nodes, need_logging)
+
+
+def finish_MST(nodes):
+    """
+    Put the links of MST into the order the nodes would add them in and get ready to perform the broadcasts over it.
+    Every node floods at least one message of SynchGHS, so the nodes without enough energy die the same way they do
+    when the nodes find MST themselves (see Node.flood_tree).
+    :param nodes: List of all alive nodes
+    """
+    for node in nodes:
+        node.check_energy()
+    # Links are stored by replay_levels in the order of the leaders, put them into the order the nodes would add them in
+    order = find_tree_link_order(nodes)
+    for node in nodes:
+        node.tree_neighbors.sort(key=lambda neighbor_id: order[(node.node_id, neighbor_id)])
+
+
+def broadcast(nodes, sender):
+    """
+    Perform a broadcast from the sender over MST found by find_MST. Every node sends the data to all its neighbors
+    in MST except the one it got the data from, updates its energy and logs every data transfer. Node dies if its
+    energy drops below the minimum budget.
+    :param nodes: List of all alive nodes
+    :param sender: The ID of the node that initiates the broadcast
+    """
+    scheduler.broadcast(nodes, sender)
+
+
+def handle_dead_nodes(given_nodes):
+    """
+    Same as MST.handle_dead_nodes, but new MST is found centrally.
+    :param given_nodes: List of nodes
+    :return: List of nodes with calculated new MST excluding dead nodes
+    """
+    dead_nodes = [node for node in given_nodes if not node.alive]
+    if dead_nodes:
+        nodes_dead(dead_nodes)
+        given_nodes = [node for node in given_nodes if node.alive]
+        clean(given_nodes)
+        find_MST(given_nodes)
+
+    return given_nodes
+
+
+def verify_MST(nodes):
+    """
+    Cross-check MST found by the nodes against the MST found centrally with Kruskal's algorithm.
+    :param nodes: List of all alive nodes after MST has been found
+    :return: Links that are missing from nodes' MST and links in nodes' MST that should not be there,
+            both in the form (smaller node ID, bigger node ID)
+    """
+    expected = set(link for _, link in kruskal(nodes))
+    found = set((min(node.node_id, neighbor_id), max(node.node_id, neighbor_id))
+                for node in nodes for neighbor_id in node.tree_neighbors)
+    return sorted(expected - found), sorted(found - expected)
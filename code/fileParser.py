@@ -1,29 +1,89 @@
 from Node import Node
+from messageCounter import MessageCounter
+from array import array
+import mmap
 
 
-def parse_file(file_to_parse):
+class NetworkColumns:
     """
-    Parses the file
-    :param file_to_parse: File name to be parsed
-    :return: Array of Node objects and list of bcsts to be performed
+    Parsed network kept in columns: one compact array for each of the node IDs, x and y coordinates and energies,
+    plus the array of broadcasts. Node objects are created from the columns once the simulation starts, all of them
+    sharing the same minimum budget, the same dictionary of message queues and the same counter of the messages.
     """
 
+    def __init__(self):
+        self.minimum_budget = 0.0
+        self.message_queue = {}
+        self.in_flight = MessageCounter()
+        self.ids = array('l')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.energies = array('d')
+        self.bcsts = array('l')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_nodes(self):
+        """
+        :return: The list of Node objects of all the nodes
+        """
+        return [Node(node_id, (x, y), energy, self.message_queue, self.in_flight, self.minimum_budget)
+                for node_id, x, y, energy in zip(self.ids, self.xs, self.ys, self.energies)]
+
+
+def read_lines(f, use_mmap):
+    """
+    Iterate over the lines of the opened file.
+    :param f: Opened file
+    :param use_mmap: Flag specifying if the file should be memory-mapped instead of read through the file buffer
+    """
+    if not use_mmap:
+        return f
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can not be memory-mapped
+        return iter([])
+    mapped.seek(f.tell())
+    return iter(mapped.readline, '')
+
+
+def parse_columns(file_to_parse, use_mmap=False):
+    """
+    Parses the file line by line straight into columns, without keeping the file in memory.
+    :param file_to_parse: File name to be parsed
+    :param use_mmap: Flag specifying if the file should be memory-mapped
+    :return: NetworkColumns with all the nodes and bcsts
+    """
+    columns = NetworkColumns()
     f = open(file_to_parse, 'r')
 
     # Extract minimum budget
     mb = f.readline()
-    Node.minimum_budget = float(mb)
-
-    # Extract nodes and bcsts
-    nodes = []
-    bcsts = []
-    for line in f:
-        data = line.split()
-        if data[0] == 'node':
-            # Create a new Node object
-            nodes.append(Node(data[1][:-1], (data[2][:-1], data[3][:-1]), data[4]))
-        if data[0] == 'bcst':
-            bcsts.append(int(data[2]))
+    columns.minimum_budget = float(mb)
+
+    # Extract nodes and bcsts. Node lines are in the form 'node ID, x, y, energy', bcst lines - 'bcst from ID'
+    for line in read_lines(f, use_mmap):
+        if line.startswith('node'):
+            head, x, y, energy = line.split(',')
+            columns.ids.append(int(head[4:]))
+            columns.xs.append(float(x))
+            columns.ys.append(float(y))
+            columns.energies.append(float(energy))
+        elif line.startswith('bcst'):
+            columns.bcsts.append(int(line.split()[2]))
 
     f.close()
-    return nodes, bcsts
+    return columns
+
+
+def parse_file(file_to_parse, use_mmap=False):
+    """
+    Parses the file
+    :param file_to_parse: File name to be parsed
+    :param use_mmap: Flag specifying if the file should be memory-mapped
+    :return: Array of Node objects and list of bcsts to be performed
+    """
+    columns = parse_columns(file_to_parse, use_mmap)
+    return columns.get_nodes(), columns.bcsts
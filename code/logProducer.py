@@ -1,16 +1,151 @@
+from binaryTrace import DATA, ADDED, ELECTED, DOWN, leaders_records, pack, parse_line, format_line
+import threading
+import atexit
+import Queue
+import os
+
+writer = None
+file_name = 'log.txt'
+# Log is written as binary trace (see binaryTrace.py) instead of text lines
+binary = False
+# Lines logged since start_recording was called, None if not recording
+recorded = None
+
 
 def get_file_name():
-    return 'log.txt'
+    return file_name
+
+
+def set_file_name(name, binary_trace=False):
+    """
+    Log into another file from now on. Everything logged so far by this process is written into the previous file
+    first.
+    :param name: Name of the file to log into
+    :param binary_trace: Flag specifying if the file should be written as binary trace (see binaryTrace.py)
+    """
+    global file_name, writer, binary
+    if writer is not None and writer.pid == os.getpid():
+        writer.close()
+    writer = None
+    file_name = name
+    binary = binary_trace
 
 
 def get_file_mode():
-    return 'a'
+    return 'ab' if binary else 'a'
 
 
 def open_file():
     return open(get_file_name(), get_file_mode())
 
 
+class LogWriter:
+    """
+    Single sink for all the logged lines. Lines are put into a queue and written into the file by a background
+    thread in the same order as they were logged. The file is opened once and flushed only when there is nothing
+    left to write, so many lines are written at once.
+    """
+
+    def __init__(self, batch_size=1024):
+        """
+        :param batch_size: Maximum number of lines written into the file at once
+        """
+        self.batch_size = batch_size
+        self.pid = os.getpid()
+        self.file = open_file()
+        self.lines = Queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='log-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """
+        Keep writing the queued lines into the file until None is received instead of a line.
+        """
+        while True:
+            batch = [self.lines.get()]
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.lines.get_nowait())
+                except Queue.Empty:
+                    break
+            closing = batch[-1] is None
+            self.file.write(''.join(batch[:-1] if closing else batch))
+            if closing or self.lines.empty():
+                self.file.flush()
+            for _ in batch:
+                self.lines.task_done()
+            if closing:
+                self.file.close()
+                break
+
+    def write(self, line):
+        self.lines.put(line)
+
+    def flush(self):
+        """
+        Wait until all the logged lines are written into the file.
+        """
+        self.lines.join()
+
+    def close(self):
+        self.lines.put(None)
+        self.thread.join()
+
+
+def get_writer():
+    """
+    Get the log writer of this process, start a new one if there is none yet. Processes started after the writer
+    was created (see shardedBackend.py) get a writer of their own.
+    """
+    global writer
+    if writer is None or writer.pid != os.getpid():
+        writer = LogWriter()
+        atexit.register(writer.close)
+    return writer
+
+
+def write_line(line):
+    if recorded is not None:
+        recorded.append(line)
+    get_writer().write(pack(parse_line(line)) if binary else line + '\n')
+
+
+def write_records(records):
+    """
+    Log a single line given by its records (see binaryTrace.py) into the binary trace.
+    :param records: Records of the line
+    """
+    if recorded is not None:
+        recorded.append(format_line(records))
+    get_writer().write(pack(records))
+
+
+def start_recording():
+    """
+    Start keeping every line logged by this process, so that it can be logged again later (see mstCache.py).
+    """
+    global recorded
+    recorded = []
+
+
+def stop_recording():
+    """
+    :return: The lines logged since start_recording was called
+    """
+    global recorded
+    lines, recorded = recorded, None
+    return lines
+
+
+def flush_log():
+    """
+    Make sure everything logged so far by this process is in the file.
+    """
+    if writer is not None and writer.pid == os.getpid():
+        writer.flush()
+
+
 def alert_leaders_to_start_level(nodes, need_logging):
     """
     Logs the ids of the alerted nodes
@@ -19,12 +154,13 @@ def alert_leaders_to_start_level(nodes, need_logging):
     """
     if not need_logging:
         return
-    f = open_file()
     # Log only the nodes that are leaders at this stage
+    if binary:
+        write_records(leaders_records([node.node_id for node in nodes if node.leader]))
+        return
     leaders = [str(node.node_id) for node in nodes if node.leader]
     leader_string = ','.join(leaders)
-    f.write('bs %s\n' % leader_string)
-    f.close()
+    write_line('bs %s' % leader_string)
 
 
 def new_links_added(links_queue, need_logging):
@@ -33,19 +169,19 @@ def new_links_added(links_queue, need_logging):
     :param links_queue: Queue of links to be logged
     :param need_logging: Flag specifying if logging is required
     """
-    f = open_file()
-    previous_links = []
+    previous_links = set()
     while True:
         if links_queue.empty():
             break
         _, link = links_queue.get()
+        link_to_add = (min(link), max(link))
         # Make sure we do not log same link but in reversed order
-        if (not link in previous_links) and (not (link[1], link[0]) in previous_links) and need_logging:
-            link_to_add = (min(link), max(link))
-            f.write('added %s-%s\n' % link_to_add)
-            previous_links.append(link_to_add)
-
-    f.close()
+        if link_to_add not in previous_links and need_logging:
+            if binary:
+                write_records([(ADDED, link_to_add[0], link_to_add[1], 0.0)])
+            else:
+                write_line('added %s-%s' % link_to_add)
+            previous_links.add(link_to_add)
 
 
 def new_leaders_elected(nodes, need_logging):
@@ -56,13 +192,13 @@ def new_leaders_elected(nodes, need_logging):
     """
     if not need_logging:
         return
-    f = open_file()
     for node in nodes:
         # If node was elected in the previous round - log it
         if node.elected:
-            f.write('elected %s\n' % node.node_id)
-
-    f.close()
+            if binary:
+                write_records([(ELECTED, node.node_id, 0, 0.0)])
+            else:
+                write_line('elected %s' % node.node_id)
 
 
 def nodes_dead(nodes):
@@ -70,7 +206,21 @@ def nodes_dead(nodes):
     Log dead nodes
     :param nodes: List of dead nodes in the network
     """
-    f = open_file()
     for node in nodes:
-        f.write('node down %s\n' % node.node_id)
-    f.close()
+        if binary:
+            write_records([(DOWN, node.node_id, 0, 0.0)])
+        else:
+            write_line('node down %s' % node.node_id)
+
+
+def data_sent(sender_id, receiver_id, energy):
+    """
+    Log the transfer of large volume data from one node to another
+    :param sender_id: ID of the node sending the data
+    :param receiver_id: ID of the node receiving the data
+    :param energy: Energy of the sender left after sending the data
+    """
+    if binary:
+        write_records([(DATA, sender_id, receiver_id, energy)])
+    else:
+        write_line('data from %s to %s, energy:%s' % (sender_id, receiver_id, energy))
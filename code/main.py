@@ -1,27 +1,63 @@
-from fileParser import parse_file
-from MST import *
-from logProducer import get_file_name
+from simulation import Simulation, VerificationError
+import sys
 
-# Getting input file name from the user command
+# Getting input file name and options from the user command
 if __name__ == "__main__":
-    import sys
-    file_to_parse = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser(description='Find the MST of the sensor network and perform the broadcasts.')
+    parser.add_argument('input', help='File describing the network and the broadcasts')
+    parser.add_argument('--log', help='File to log into. log.txt by default, trace.bin with --trace')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Number of processes to run the nodes in. By default everything runs in this process')
+    parser.add_argument('--engine', choices=['distributed', 'events', 'fast'], default='distributed',
+                        help='Simulate SynchGHS with the nodes (distributed), with the nodes in a single thread and '
+                             'virtual time (events) or find MST and perform broadcasts centrally (fast)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Memory-map the input file instead of reading it through the file buffer')
+    parser.add_argument('--verify', action='store_true',
+                        help='Cross-check every MST found by the nodes against the centrally found MST')
+    parser.add_argument('--simulate-broadcasts', action='store_true',
+                        help='Let the nodes flood every broadcast themselves instead of accounting it centrally. '
+                             'Does not affect the fast engine')
+    parser.add_argument('--cache', metavar='DIRECTORY',
+                        help='Keep every MST found by the nodes in the directory and reuse it then the same network '
+                             'is run again. Does not affect the fast engine or --shards')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Record the time of every phase, the messages sent and the mailbox depths and write them '
+                             'into the file as JSON')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='The lowest latency of a link in seconds of virtual time. Only affects the events engine')
+    parser.add_argument('--latency-spread', type=float, default=0.0,
+                        help='How much higher than the lowest latency the latency of a link can be')
+    parser.add_argument('--latency-seed', type=int, default=0, help='Seed choosing the latencies of the links')
+    parser.add_argument('--concurrent-broadcasts', type=int, default=1, metavar='N',
+                        help='Let the nodes perform up to N broadcasts at the same time, as long as no node dies. '
+                             'Only affects --simulate-broadcasts')
+    parser.add_argument('--compact-topology', action='store_true',
+                        help='Keep the neighbors of all the nodes in a single compact store instead of a dictionary '
+                             'in every node. Does not affect the fast engine or --shards')
+    parser.add_argument('--topology-file', metavar='FILE',
+                        help='Keep the compact store of the neighbors in the memory-mapped file (requires NumPy). '
+                             'Implies --compact-topology')
+    parser.add_argument('--trace', action='store_true',
+                        help='Write the log as binary trace instead of text. Turn it into the text log with '
+                             'binaryTrace.py')
+    parser.add_argument('--asynchronous', action='store_true',
+                        help='Find MST with asynchronous GHS algorithm, without the levels run by the base station. '
+                             'Does not affect the fast engine')
+    options = parser.parse_args()
 
-# Parse the file first
-nodes, bcsts = parse_file(file_to_parse)
-
-# Find the MST and log the results into the file 'log.txt'
-find_MST(nodes, need_logging=True)
-
-# Just in case some nods does not have enough energy at the start of the first bcst
-if bcsts:
-    nodes = handle_dead_nodes(nodes)
-
-# For each given broadcast perform the broadcast one at the time
-for bcst in bcsts:
-    if not bcst in [node.node_id for node in nodes]:
-        continue
-    # Alert all to start sending\receiving a message from sender node
-    alert_all(nodes, action='start_bcst', args=[bcst], handle=True)
-    # If any of the nodes is dead - clean nodes and recompute MST excluding that node
-    nodes = handle_dead_nodes(nodes)
+    log_file = options.log or ('trace.bin' if options.trace else 'log.txt')
+    simulation = Simulation(options.input, log_file=log_file, engine=options.engine, shards=options.shards,
+                            use_mmap=options.mmap, verify=options.verify,
+                            simulate_broadcasts=options.simulate_broadcasts, cache_directory=options.cache,
+                            metrics_file=options.metrics, latency=options.latency,
+                            latency_spread=options.latency_spread, latency_seed=options.latency_seed,
+                            concurrent_broadcasts=options.concurrent_broadcasts,
+                            compact_topology=options.compact_topology, topology_file=options.topology_file,
+                            binary_trace=options.trace, asynchronous=options.asynchronous)
+    try:
+        simulation.run()
+    except VerificationError as error:
+        sys.stderr.write('%s\n' % error)
+        sys.exit(1)
@@ -0,0 +1,49 @@
+import threading
+
+
+class MessageCounter:
+    """
+    Counts the messages sent between the nodes of a network and the messages the nodes are done with, so that base
+    station knows exactly then no node has anything left to do (see MST.handle_termination).
+    Node is done with a message then it asks for the next one (see Node.receive): by then it has handled the message
+    and every message it sent because of it has already been counted as sent. Action every node starts the phase with
+    is counted the same way as a message. Then the counts are equal, every node is waiting for a message, all the
+    message queues are empty and nothing is on the way - no node can ever send anything new in this phase.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.done = 0
+        self.condition = threading.Condition()
+
+    def add(self, count=1):
+        """
+        Count the messages as sent. Must be called before the messages are put into the message queue.
+        :param count: Number of messages
+        """
+        with self.condition:
+            self.sent += count
+
+    def finish(self):
+        """
+        Count a message as done with.
+        """
+        with self.condition:
+            self.done += 1
+            if self.done == self.sent:
+                self.condition.notify_all()
+
+    def read(self):
+        """
+        :return: The number of messages sent and done with so far in the form (sent, done)
+        """
+        with self.condition:
+            return self.sent, self.done
+
+    def wait(self):
+        """
+        Wait until every message sent so far is done with.
+        """
+        with self.condition:
+            while self.done != self.sent:
+                self.condition.wait()
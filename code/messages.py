@@ -0,0 +1,67 @@
+# Communication types - the first element of every message put into node's message queue
+DISCOVER = 0
+DISCOVER_RESPONSE = 1
+NEIGHBOR = 2
+BEACON = 4
+
+# Types of the neighbor messages
+FIND_CHEAPEST_LINK = 0
+MY_CHEAPEST_LINK = 1
+LINK_DECISION = 2
+MY_CURRENT_MST = 3
+ID_PROPOSAL = 4
+DATA_BROADCAST = 5
+# Asking the neighbor if it is in another connected component and its answers (see Node.test_cheapest_link)
+TEST = 6
+ACCEPT = 7
+REJECT = 8
+# Messages of the asynchronous GHS algorithm (see Node.grow_fragments), which also uses TEST, ACCEPT and REJECT
+CONNECT = 9
+INITIATE = 10
+REPORT = 11
+CHANGE_ROOT = 12
+
+# Names of the types of neighbor messages (see metrics.py)
+NEIGHBOR_MESSAGE_NAMES = {FIND_CHEAPEST_LINK: 'find_cheapest_link',
+                          MY_CHEAPEST_LINK: 'my_cheapest_link',
+                          LINK_DECISION: 'link_decision',
+                          MY_CURRENT_MST: 'my_current_mst',
+                          ID_PROPOSAL: 'id_proposal',
+                          DATA_BROADCAST: 'data_broadcast',
+                          TEST: 'test',
+                          ACCEPT: 'accept',
+                          REJECT: 'reject',
+                          CONNECT: 'connect',
+                          INITIATE: 'initiate',
+                          REPORT: 'report',
+                          CHANGE_ROOT: 'change_root'}
+
+
+class Message(object):
+    """ Neighbor message sent from one node to another """
+    __slots__ = ('type', 'data')
+
+    def __init__(self, message_type, data=None):
+        """
+        :param message_type: One of the types of the neighbor messages
+        :param data: Data carried by the message, if any
+        """
+        self.type = message_type
+        self.data = data
+
+    def __getstate__(self):
+        return self.type, self.data
+
+    def __setstate__(self, state):
+        self.type, self.data = state
+
+
+# Messages that carry no data are created only once and shared by everyone
+FIND_CHEAPEST_LINK_MESSAGE = Message(FIND_CHEAPEST_LINK)
+DATA_BROADCAST_MESSAGE = Message(DATA_BROADCAST)
+ACCEPT_MESSAGE = Message(ACCEPT)
+REJECT_MESSAGE = Message(REJECT)
+CHANGE_ROOT_MESSAGE = Message(CHANGE_ROOT)
+# Messages from base station
+BEACON_MESSAGE = (BEACON, None, None, None)
+DISCOVERY_BEACON_MESSAGE = (BEACON, None, None)
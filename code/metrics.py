@@ -0,0 +1,159 @@
+import threading
+import cPickle
+import json
+
+# Everything below is only recorded if metrics are enabled. Callers check the flag themselves before calling any of
+# the recording functions, so disabled metrics cost a single attribute lookup on the hot paths.
+enabled = False
+lock = threading.Lock()
+
+phases = {}
+simulated_phases = {}
+levels = []
+current_level = None
+messages = {}
+requeues = {}
+mailbox_depths = {}
+
+
+def enable():
+    """
+    Start recording the metrics from scratch.
+    """
+    global enabled
+    reset()
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Forget everything recorded so far.
+    """
+    global current_level
+    with lock:
+        phases.clear()
+        simulated_phases.clear()
+        del levels[:]
+        current_level = None
+        messages.clear()
+        requeues.clear()
+        mailbox_depths.clear()
+
+
+def start_level(level):
+    """
+    Attribute the phases from now on to the given level of MST algorithm (see MST.build_MST).
+    :param level: The level that is starting, None if no level is running any more
+    """
+    global current_level
+    with lock:
+        current_level = level
+        if level is not None:
+            levels.append({'level': level, 'phases': {}})
+
+
+def phase_finished(action, seconds):
+    """
+    Record the wall time of a phase - the time all nodes took to perform the action (see MST.alert_all).
+    :param action: The action performed by the nodes
+    :param seconds: Wall time of the phase
+    """
+    with lock:
+        count, total, longest = phases.get(action, (0, 0.0, 0.0))
+        phases[action] = (count + 1, total + seconds, max(longest, seconds))
+        if current_level is not None:
+            level_phases = levels[-1]['phases']
+            level_phases[action] = level_phases.get(action, 0.0) + seconds
+
+
+def phase_simulated(action, seconds):
+    """
+    Record the virtual time of a phase - the time the action would take with the messages travelling over links
+    with the latencies given to the discrete-event backend (see discreteEventBackend.py).
+    :param action: The action performed by the nodes
+    :param seconds: Virtual time of the phase
+    """
+    with lock:
+        count, total = simulated_phases.get(action, (0, 0.0))
+        simulated_phases[action] = (count + 1, total + seconds)
+
+
+def message_sent(message_type, message):
+    """
+    Record a message put into a message queue of some node.
+    :param message_type: Name of the message type
+    :param message: The whole message as put into the queue. Its size is the size of it pickled, the same as it
+                would be sent between the processes
+    """
+    size = len(cPickle.dumps(message, cPickle.HIGHEST_PROTOCOL))
+    with lock:
+        count, total = messages.get(message_type, (0, 0))
+        messages[message_type] = (count + 1, total + size)
+
+
+def requeued(reason):
+    """
+    Record a message node put aside to handle it later.
+    :param reason: 'reordering' for the messages that arrived before the node was ready for them, 'asynchronous'
+                for the messages of asynchronous GHS the node can not handle at its current level or state yet
+    """
+    with lock:
+        requeues[reason] = requeues.get(reason, 0) + 1
+
+
+def mailbox_depth(node_id, depth):
+    """
+    Record the number of messages waiting in the message queue of the node.
+    :param node_id: ID of the node
+    :param depth: Number of messages in the queue
+    """
+    if depth > mailbox_depths.get(node_id, -1):
+        with lock:
+            mailbox_depths[node_id] = max(depth, mailbox_depths.get(node_id, 0))
+
+
+def snapshot():
+    """
+    :return: Everything recorded so far as a dictionary that can be written as JSON
+    """
+    with lock:
+        return {'phases': dict((action, {'count': count, 'seconds': total, 'longest': longest})
+                               for action, (count, total, longest) in phases.items()),
+                'simulated_phases': dict((action, {'count': count, 'seconds': total})
+                                         for action, (count, total) in simulated_phases.items()),
+                'levels': [{'level': level['level'], 'phases': dict(level['phases'])} for level in levels],
+                'messages': dict((message_type, {'count': count, 'bytes': size})
+                                 for message_type, (count, size) in messages.items()),
+                'requeues': dict(requeues),
+                'mailbox_depths': dict((str(node_id), depth) for node_id, depth in mailbox_depths.items())}
+
+
+def merge(other):
+    """
+    Add metrics recorded by another process (see shardedBackend.py) to the ones recorded by this process.
+    Phases and levels are timed by base station only, so only the counters are merged.
+    :param other: Snapshot of the metrics of the other process
+    """
+    with lock:
+        for message_type, counters in other['messages'].items():
+            count, total = messages.get(message_type, (0, 0))
+            messages[message_type] = (count + counters['count'], total + counters['bytes'])
+        for reason, count in other['requeues'].items():
+            requeues[reason] = requeues.get(reason, 0) + count
+        for node_id, depth in other['mailbox_depths'].items():
+            mailbox_depths[int(node_id)] = max(depth, mailbox_depths.get(int(node_id), 0))
+
+
+def export(file_name):
+    """
+    Write everything recorded so far into the file as JSON.
+    :param file_name: The file to write the metrics into
+    """
+    f = open(file_name, 'w')
+    json.dump(snapshot(), f, indent=2, sort_keys=True)
+    f.close()
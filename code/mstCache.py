@@ -0,0 +1,125 @@
+from logProducer import start_recording, stop_recording, write_line
+from topologyStore import get_candidates
+import hashlib
+import cPickle
+import os
+
+# Bumped every time the content of the cached entries changes
+VERSION = 4
+
+
+class MSTCache:
+    """
+    On-disk cache of found MSTs. Every entry keeps what every node knows after MST has been found (neighbors, its part
+    of MST, whether it is a leader or has been elected and the leader of its connected component) together with the
+    lines logged while finding it. Then the same MST is needed again, nodes are put into the same state and the same
+    lines are logged without running the algorithm at all.
+    MST only depends on the positions of the alive nodes and R, so the entries are shared by all the runs over the same
+    network, whatever broadcasts are performed and whatever the energies are. Energies only decide which nodes die
+    while finding MST, so that is checked again every time an entry is used.
+    """
+
+    def __init__(self, directory, nodes, radius, asynchronous=False, compact_topology=False):
+        """
+        :param directory: Directory to keep the entries in. Created if it does not exist
+        :param nodes: List of all the nodes of the network
+        :param radius: The distance within which nodes can reach each other
+        :param asynchronous: Flag specifying if MSTs are found by asynchronous GHS, which logs other lines (see
+                    MST.build_MST_asynchronously)
+        :param compact_topology: Flag specifying if the nodes keep their neighbors in the compact store, where they only
+                    keep their own links of MST and so might add the links in another order (see Node.index_mst)
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        network = hashlib.sha1('%d %r\n' % (VERSION, radius))
+        if asynchronous:
+            network.update('asynchronous\n')
+        if compact_topology:
+            network.update('compact topology\n')
+        for node in sorted(nodes, key=lambda node: node.node_id):
+            network.update('%d %r %r\n' % (node.node_id, node.position[0], node.position[1]))
+        self.network = network.hexdigest()
+
+    def add_nodes(self, new_nodes):
+        """
+        Take the nodes joining the network into account, so that the entries of the network with them are not shared
+        with the runs joining other nodes (or the same nodes in other positions).
+        :param new_nodes: List of the new nodes
+        """
+        network = hashlib.sha1(self.network)
+        for node in new_nodes:
+            network.update('%d %r %r\n' % (node.node_id, node.position[0], node.position[1]))
+        self.network = network.hexdigest()
+
+    def get_key(self, nodes, dead_nodes, need_logging, new_nodes=None):
+        """
+        :param nodes: List of the alive nodes
+        :param dead_nodes: List of the nodes that just died if MST is repaired, None if MST is found from scratch
+        :param need_logging: Flag specifying if logging is required
+        :param new_nodes: List of the nodes that just joined the network if MST is updated for them
+        :return: The key of the entry
+        """
+        key = hashlib.sha1(self.network)
+        key.update(','.join(str(node_id) for node_id in sorted(node.node_id for node in nodes)))
+        if dead_nodes is not None:
+            # Repair starts from the fragments of the previous MST, so the nodes alive before matter as well
+            key.update(' dead ' + ','.join(str(node_id) for node_id in sorted(node.node_id for node in dead_nodes)))
+        if new_nodes is not None:
+            # Update starts from MST of the nodes there before
+            key.update(' joined ' + ','.join(str(node_id) for node_id in sorted(node.node_id for node in new_nodes)))
+        key.update(' logged' if need_logging else '')
+        return key.hexdigest()
+
+    def get_file_name(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def run(self, nodes, dead_nodes, need_logging, find, new_nodes=None):
+        """
+        Put the nodes into the state they would be in after MST is found and log the same lines, either from the cache
+        or by finding MST and storing the result into the cache.
+        :param nodes: List of the alive nodes
+        :param dead_nodes: List of the nodes that just died if MST is repaired, None if MST is found from scratch
+        :param need_logging: Flag specifying if logging is required
+        :param find: Function finding MST if it is not in the cache
+        :param new_nodes: List of the nodes that just joined the network if MST is updated for them
+        """
+        file_name = self.get_file_name(self.get_key(nodes, dead_nodes, need_logging, new_nodes))
+        if os.path.exists(file_name):
+            f = open(file_name, 'rb')
+            lines, states = cPickle.load(f)
+            f.close()
+            self.replay(nodes, lines, states)
+            return
+
+        start_recording()
+        try:
+            find()
+        finally:
+            lines = stop_recording()
+        states = dict((node.node_id, (node.leader, node.elected, node.fragment, node.neighbors, node.get_mst(),
+                                      node.tree_neighbors)) for node in nodes)
+        # Written under another name first, so that other runs never see a half written entry
+        temporary_name = '%s.%d' % (file_name, os.getpid())
+        f = open(temporary_name, 'wb')
+        cPickle.dump((lines, states), f, cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(temporary_name, file_name)
+
+    def replay(self, nodes, lines, states):
+        """
+        Put the nodes into the stored state and log the stored lines. Every node floods some message while finding
+        MST, so the nodes without enough energy die as they would if MST was found (see Node.flood_tree).
+        :param nodes: List of the alive nodes
+        :param lines: Lines logged while MST was found
+        :param states: Dictionary mapping node ID to the state of the node after MST was found
+        """
+        for node in nodes:
+            node.leader, node.elected, node.fragment, node.neighbors, mst, tree_neighbors = states[node.node_id]
+            node.candidates = get_candidates(node.node_id, node.neighbors)
+            node.index_mst(mst)
+            # Links in MST might have been put into another order than they are in the node's MST (see MST.repair_MST)
+            node.tree_neighbors = tree_neighbors
+            node.check_energy()
+        for line in lines:
+            write_line(line)
@@ -0,0 +1,278 @@
+from workerPool import WorkerPool
+from Node import Node
+from messageCounter import MessageCounter
+from logProducer import flush_log
+from messages import BEACON_MESSAGE
+import metrics
+import MST
+import multiprocessing
+import threading
+import Queue
+import bisect
+
+# Placeholder sent to the shards instead of the base station maintained events queue
+EVENTS = 'events_queue'
+
+
+class RemoteMailbox:
+    """
+    Message queue of a node that lives in another process. Putting a message into it sends the message to the
+    inbox of the shard owning the node, from where it is delivered into the real message queue of the node.
+    """
+
+    def __init__(self, inbox, node_id):
+        """
+        :param inbox: Inbox of the shard that owns the node
+        :param node_id: ID of the node this mailbox belongs to
+        """
+        self.inbox = inbox
+        self.node_id = node_id
+
+    def put(self, message):
+        self.inbox.put((self.node_id, message))
+
+
+def partition(nodes, shards):
+    """
+    Split nodes into spatial regions - vertical strips holding roughly the same number of nodes each.
+    :param nodes: List of all known nodes
+    :param shards: Number of regions
+    :return: Dictionary mapping node ID to the number of the region it belongs to
+    """
+    ordered = sorted(nodes, key=lambda node: (node.position[0], node.node_id))
+    return dict((node.node_id, index * shards // len(ordered)) for index, node in enumerate(ordered))
+
+
+def route(inbox, message_queue):
+    """
+    Deliver the messages arriving into the inbox of this shard into the message queues of its nodes.
+    :param inbox: Inbox of this shard
+    :param message_queue: Dictionary mapping node ID to the message queue of the node
+    """
+    while True:
+        node_id, message = inbox.get()
+        message_queue[node_id].put(message)
+
+
+def run_shard(shard_id, nodes, message_queue, in_flight, owners, inboxes, connection):
+    """
+    Main loop of a shard process. Shard owns the given nodes, performs the actions base station asks for and reports
+    back the state of its nodes.
+    :param shard_id: The number of this shard
+    :param nodes: The list of nodes owned by this shard
+    :param message_queue: Dictionary mapping node ID to the message queue of the node, shared by all the nodes
+    :param in_flight: Counter of the messages sent and done with by the nodes of this shard, shared by all of them.
+                Messages sent to other shards are done with there, so only the sum over all the shards is balanced
+    :param owners: Dictionary mapping every node ID to the number of the shard owning it
+    :param inboxes: Inboxes of all the shards
+    :param connection: Connection to the base station
+    """
+    MST.backend = None
+    MST.workers = WorkerPool()
+    local_nodes = dict((node.node_id, node) for node in nodes)
+    for node_id, owner in owners.items():
+        message_queue[node_id] = Queue.Queue() if owner == shard_id else RemoteMailbox(inboxes[owner], node_id)
+
+    router = threading.Thread(target=route, args=(inboxes[shard_id], message_queue))
+    router.daemon = True
+    router.start()
+
+    events_queue = Queue.Queue()
+    phase = None
+    phase_nodes = []
+    while True:
+        command = connection.recv()
+        if command[0] == 'alert':
+            _, action, node_ids, args, handle = command
+            args = [events_queue if arg == EVENTS else arg for arg in args]
+            phase_nodes = [local_nodes[node_id] for node_id in node_ids if node_id in local_nodes]
+            # Counted before replying to any poll, same as MST.alert_all does
+            if handle:
+                in_flight.add(len(phase_nodes))
+            phase = threading.Thread(target=MST.alert_all, args=(phase_nodes, action, args))
+            phase.start()
+        if command[0] == 'poll':
+            connection.send(in_flight.read())
+        if command[0] == 'finish':
+            phase.join()
+            events = []
+            while not events_queue.empty():
+                events.append(events_queue.get())
+            # Everything logged during the phase must be in the file before base station logs anything new
+            flush_log()
+            states = dict((node.node_id, (node.leader, node.elected, node.alive, node.energy, node.tree_neighbors))
+                          for node in phase_nodes)
+            connection.send((events, states))
+        if command[0] == 'join':
+            for node_id, position, energy in command[1]:
+                owner = command[2][node_id]
+                owners[node_id] = owner
+                if owner == shard_id:
+                    local_nodes[node_id] = Node(node_id, position, energy, message_queue, in_flight,
+                                                nodes[0].minimum_budget)
+                else:
+                    message_queue[node_id] = RemoteMailbox(inboxes[owner], node_id)
+        if command[0] == 'clean':
+            node_ids = set(command[1])
+            MST.workers.retire([node for node_id, node in local_nodes.items() if node_id not in node_ids])
+            MST.clean([node for node_id, node in local_nodes.items() if node_id in node_ids])
+        if command[0] == 'stop':
+            flush_log()
+            connection.send(metrics.snapshot() if metrics.enabled else None)
+            break
+
+
+class ShardedBackend:
+    """
+    Runs the nodes in several worker processes, so that the simulation is not limited by a single CPU core.
+    Nodes are split into spatial regions, one per process. Messages between nodes in the same region stay within
+    the process, messages to the nodes in other regions are sent through the inbox of the owning process.
+    Base station stays in the main process and coordinates the phases across all processes.
+    """
+    # Nodes live in the shard processes, so their state cannot be cached (see MST.find_MST)
+    nodes_in_process = False
+
+    def __init__(self, nodes, shards=None):
+        """
+        Split given nodes into shards and start a process for each of them.
+        :param nodes: List of all known nodes
+        :param shards: Number of processes. Defaults to the number of CPU cores
+        """
+        shards = min(shards or multiprocessing.cpu_count(), len(nodes)) or 1
+        self.owners = partition(nodes, shards)
+        # Shards write into the same log file, so everything logged so far must already be there
+        flush_log()
+        self.inboxes = [multiprocessing.Queue() for _ in range(shards)]
+        # Counts the discover messages base station routes to the nodes (see MST.reach_neighbors). Network without any
+        # nodes has no counter or message queues of its own
+        self.in_flight = nodes[0].in_flight if nodes else MessageCounter()
+        message_queue = nodes[0].message_queue if nodes else {}
+        self.connections = []
+        self.processes = []
+        for shard_id in range(shards):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            shard_nodes = [node for node in nodes if self.owners[node.node_id] == shard_id]
+            process = multiprocessing.Process(target=run_shard,
+                                              args=(shard_id, shard_nodes, message_queue, self.in_flight,
+                                                    self.owners, self.inboxes, child_connection))
+            process.daemon = True
+            process.start()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+        # From now on every message sent from the base station goes to the process owning the node
+        for node in nodes:
+            node.message_queue[node.node_id] = self.mailbox(node.node_id)
+
+    def mailbox(self, node_id):
+        """
+        Get the message queue the base station should use to send messages to the given node.
+        :param node_id: ID of the node
+        :return: Mailbox of the node
+        """
+        return RemoteMailbox(self.inboxes[self.owners[node_id]], node_id)
+
+    def add_nodes(self, nodes, new_nodes):
+        """
+        Create the new nodes in the shard processes. Every new node goes to the shard owning the region it is in.
+        :param nodes: List of the nodes already in the shards
+        :param new_nodes: List of the new nodes
+        """
+        ordered = sorted((node.position[0], node.node_id) for node in nodes)
+        owners = {}
+        for node in new_nodes:
+            index = min(bisect.bisect_left(ordered, (node.position[0], node.node_id)), len(ordered) - 1)
+            owners[node.node_id] = self.owners[ordered[index][1]]
+        self.owners.update(owners)
+        # Nodes are sent without their message queues, which can not leave this process
+        joined = [(node.node_id, node.position, node.energy) for node in new_nodes]
+        for connection in self.connections:
+            connection.send(('join', joined, owners))
+        for node in new_nodes:
+            node.message_queue[node.node_id] = self.mailbox(node.node_id)
+
+    def alert_all(self, nodes, action, args=(), handle=False, handle_message=BEACON_MESSAGE):
+        """
+        Same as MST.alert_all, but triggers the action in every shard process. Nodes' state known by the base station
+        (leader, elected, alive flag and neighbors in MST) is updated once all nodes finish executing. Nodes without
+        enough energy die while finding MST as well (see Node.flood_tree). Base station might have found some dead
+        nodes itself (see MST.build_MST_asynchronously), so a node dead in either place stays dead. Energy only changes
+        during the broadcasts, so it is only updated after the broadcast performed by the nodes (broadcasts can also be
+        accounted by base station itself, see broadcastScheduler.py).
+        """
+        events_queue = None
+        shard_args = []
+        for arg in args:
+            if isinstance(arg, Queue.Queue):
+                events_queue = arg
+                arg = EVENTS
+            shard_args.append(arg)
+
+        node_ids = [node.node_id for node in nodes]
+        # Shards write into the same log file, so everything base station logged so far must already be there
+        flush_log()
+        for connection in self.connections:
+            connection.send(('alert', action, node_ids, shard_args, handle))
+
+        if handle:
+            self.handle_termination(nodes, handle_message)
+
+        states = {}
+        for connection in self.connections:
+            connection.send(('finish',))
+        for connection in self.connections:
+            events, shard_states = connection.recv()
+            for event in events:
+                events_queue.put(event)
+            states.update(shard_states)
+
+        for node in nodes:
+            leader, elected, alive, energy, tree_neighbors = states[node.node_id]
+            node.leader, node.elected, node.tree_neighbors = leader, elected, tree_neighbors
+            node.alive = node.alive and alive
+            if action == 'start_bcst':
+                node.energy = energy
+
+    def handle_termination(self, nodes, message):
+        """
+        Same as MST.handle_termination, but the messages are counted by every shard separately. Counts of all the
+        shards are collected in waves until two waves in a row find the same counts with as many messages done with
+        as sent. Counts only ever grow, so every shard had exactly the counts of the second wave at the time between
+        the waves - then no message was left anywhere.
+        """
+        previous = None
+        while True:
+            sent, done = self.in_flight.read()
+            for connection in self.connections:
+                connection.send(('poll',))
+            for connection in self.connections:
+                shard_sent, shard_done = connection.recv()
+                sent += shard_sent
+                done += shard_done
+            if sent == done and (sent, done) == previous:
+                break
+            previous = sent, done
+        for node in nodes:
+            node.message_queue[node.node_id].put(message)
+
+    def clean(self, nodes):
+        """
+        Clean the given nodes in the shard processes and stop the nodes that are no longer in the network.
+        :param nodes: The list of existing alive nodes
+        """
+        node_ids = [node.node_id for node in nodes]
+        for connection in self.connections:
+            connection.send(('clean', node_ids))
+
+    def stop(self):
+        """
+        Stop all shard processes. Metrics recorded by the shards are added to the ones of this process.
+        """
+        for connection in self.connections:
+            connection.send(('stop',))
+        for connection in self.connections:
+            shard_metrics = connection.recv()
+            if shard_metrics is not None:
+                metrics.merge(shard_metrics)
+        for process in self.processes:
+            process.join()
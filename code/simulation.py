@@ -0,0 +1,241 @@
+from fileParser import parse_file
+from Node import Node
+from shardedBackend import ShardedBackend
+from discreteEventBackend import DiscreteEventBackend
+from broadcastScheduler import BroadcastScheduler
+from mstCache import MSTCache
+from topologyStore import TopologyStore
+from logProducer import set_file_name, flush_log
+import MST
+import fastMST
+import metrics
+
+# The simulation started in this process and not stopped yet, None if there is no such simulation
+active = None
+
+
+class VerificationError(Exception):
+    """ MST found by the nodes differs from the centrally found MST """
+
+
+class Simulation:
+    """
+    A single run over a network: finding MST and performing all the broadcasts given in the input file, logged into
+    its own file. The simulation owns its nodes (which share their own message queues and minimum budget) and the
+    scheduler of broadcasts. The rest of the state of the run is kept by the modules and set up by start for the whole
+    process:
+        - MST.backend, MST.cache, MST.topology and MST.asynchronous, read by every phase of MST.py and fastMST.py
+        - MST.workers, the threads running the nodes
+        - The log file and its writer in logProducer.py, written by the nodes themselves (see Node.flood_tree)
+        - The counters of metrics.py, updated by the nodes for every message they send
+    The nodes log and count through these module functions from the worker threads or the shard processes, so they
+    are not handed the simulation they belong to. Only one simulation can therefore be run in a process at a time:
+    any number of them one after another in the same process, or each in a separate process at the same time (see
+    sweep.py), which is how many networks are run at once.
+    """
+
+    def __init__(self, input_file, log_file='log.txt', engine='distributed', shards=0, use_mmap=False,
+                 verify=False, simulate_broadcasts=False, cache_directory=None, metrics_file=None, latency=0.0,
+                 latency_spread=0.0, latency_seed=0, concurrent_broadcasts=1, compact_topology=False,
+                 topology_file=None, binary_trace=False, asynchronous=False):
+        """
+        :param input_file: File describing the network and the broadcasts
+        :param log_file: File to log into
+        :param engine: 'distributed' to simulate SynchGHS with the nodes, 'events' to simulate it with the nodes in
+                    a single thread and virtual time (see discreteEventBackend.py) or 'fast' to find MST and perform
+                    broadcasts centrally
+        :param shards: Number of processes to run the nodes in (see shardedBackend.py). 0 runs them in this process
+        :param use_mmap: Flag specifying if the input file should be memory-mapped
+        :param verify: Flag specifying if every MST found by the nodes should be cross-checked against the centrally
+                    found MST
+        :param simulate_broadcasts: Flag specifying if nodes should flood every broadcast themselves instead of
+                    accounting it centrally (see broadcastScheduler.py)
+        :param cache_directory: Directory to keep found MSTs in (see mstCache.py), None to always find them
+        :param metrics_file: File to write the metrics into (see metrics.py), None to not record any
+        :param latency: The lowest latency of a link in seconds of virtual time. Only used by 'events' engine
+        :param latency_spread: How much higher than the lowest latency the latency of a link can be
+        :param latency_seed: Seed choosing the latencies of the links
+        :param concurrent_broadcasts: The most broadcasts the nodes perform at the same time. Only used then the nodes
+                    flood the broadcasts themselves
+        :param compact_topology: Flag specifying if the neighbors of all the nodes should be kept in a single compact
+                    store (see topologyStore.py) instead of a dictionary in every node
+        :param topology_file: File to keep the compact store in (memory-mapped, requires NumPy). Implies
+                    compact_topology
+        :param binary_trace: Flag specifying if the log file should be written as binary trace (see binaryTrace.py)
+        :param asynchronous: Flag specifying if the nodes should find MST with asynchronous GHS algorithm instead of
+                    SynchGHS (see MST.build_MST_asynchronously). Does not affect 'fast' engine
+        """
+        self.input_file = input_file
+        self.log_file = log_file
+        self.binary_trace = binary_trace
+        self.engine = fastMST if engine == 'fast' else MST
+        self.discrete_events = engine == 'events'
+        self.shards = shards if self.engine is MST and not self.discrete_events else 0
+        self.latency = latency, latency_spread, latency_seed
+        self.use_mmap = use_mmap
+        self.verify = verify
+        self.cache_directory = cache_directory
+        self.metrics_file = metrics_file
+        # Broadcasts only depend on MST, so unless asked to simulate them they are performed without the nodes until
+        # some node dies and MST changes
+        self.scheduler = BroadcastScheduler() if self.engine is MST and not simulate_broadcasts else None
+        # Broadcasts performed at the same time are planned, so that they only overlap until some node dies
+        self.concurrent_broadcasts = concurrent_broadcasts if self.engine is MST and simulate_broadcasts else 1
+        self.planner = BroadcastScheduler() if self.concurrent_broadcasts > 1 else None
+        self.compact_topology = self.engine is MST and (compact_topology or topology_file is not None)
+        self.topology_file = topology_file
+        self.asynchronous = self.engine is MST and asynchronous
+        self.nodes = None
+        self.bcsts = None
+
+    def run(self):
+        """
+        Find MST and perform all the broadcasts.
+        :return: The list of the nodes still alive after all the broadcasts
+        """
+        self.start()
+        try:
+            self.find_MST()
+            self.perform_broadcasts()
+        finally:
+            self.stop()
+        return self.nodes
+
+    def start(self):
+        """
+        Parse the input file and set up everything needed to find MST.
+        Raises RuntimeError if another simulation is running in this process (see Simulation).
+        """
+        global active
+        if active is not None:
+            raise RuntimeError('Another simulation is already running in this process')
+        set_file_name(self.log_file, self.binary_trace)
+        if self.metrics_file:
+            metrics.enable()
+        self.nodes, self.bcsts = parse_file(self.input_file, use_mmap=self.use_mmap)
+
+        # Split the nodes across several processes or run them in virtual time if asked to
+        if self.discrete_events:
+            MST.backend = DiscreteEventBackend(self.nodes, *self.latency)
+        elif self.shards:
+            MST.backend = ShardedBackend(self.nodes, self.shards)
+        MST.cache = MSTCache(self.cache_directory, self.nodes, MST.R, self.asynchronous,
+                             self.compact_topology) if self.cache_directory else None
+        MST.asynchronous = self.asynchronous
+        MST.topology = TopologyStore(self.topology_file) if self.compact_topology else None
+        active = self
+
+    def find_MST(self):
+        """
+        Find the MST and log the results.
+        """
+        self.engine.find_MST(self.nodes, need_logging=True)
+        self.verify_MST()
+
+        # Just in case some nods does not have enough energy at the start of the first bcst
+        if self.bcsts:
+            self.nodes = self.engine.handle_dead_nodes(self.nodes)
+            self.verify_MST()
+
+    def perform_broadcasts(self):
+        """
+        Perform every broadcast one at the time, repairing MST every time some node dies.
+        :return: The number of performed broadcasts
+        """
+        performed = 0
+        alive_ids = set(node.node_id for node in self.nodes)
+        position = 0
+        while position < len(self.bcsts):
+            senders, position = self.next_broadcasts(position, alive_ids)
+            if not senders:
+                continue
+            performed += len(senders)
+            if self.scheduler is not None:
+                if not self.scheduler.broadcast(self.nodes, senders[0]):
+                    continue
+            elif len(senders) > 1:
+                self.engine.broadcast_all(self.nodes, senders)
+            else:
+                self.engine.broadcast(self.nodes, senders[0])
+            # If any of the nodes is dead - clean nodes and recompute MST excluding that node
+            alive_count = len(self.nodes)
+            self.nodes = self.engine.handle_dead_nodes(self.nodes)
+            if len(self.nodes) != alive_count:
+                alive_ids = set(node.node_id for node in self.nodes)
+                for scheduler in (self.scheduler, self.planner):
+                    if scheduler is not None:
+                        scheduler.invalidate()
+            self.verify_MST()
+        return performed
+
+    def join(self, new_nodes):
+        """
+        Add new nodes into the network once MST has been found, e.g. between the broadcasts. MST is updated for them
+        instead of being found again from scratch (see MST.join_nodes).
+        :param new_nodes: List of the new nodes in the form (node ID, (x, y), energy)
+        :return: The list of all alive nodes
+        """
+        node_ids = set(node.node_id for node in self.nodes)
+        for node_id, _, _ in new_nodes:
+            if node_id in node_ids:
+                raise ValueError('Node %s is already in the network' % node_id)
+            node_ids.add(node_id)
+        first = self.nodes[0]
+        joined = [Node(node_id, position, energy, first.message_queue, first.in_flight, first.minimum_budget)
+                  for node_id, position, energy in new_nodes]
+        self.nodes = self.engine.join_nodes(self.nodes, joined, need_logging=True)
+        for scheduler in (self.scheduler, self.planner):
+            if scheduler is not None:
+                scheduler.invalidate()
+        self.verify_MST()
+        return self.nodes
+
+    def next_broadcasts(self, position, alive_ids):
+        """
+        Find the broadcasts to perform next - the next one with the sender still alive or, if the nodes perform
+        several broadcasts at the same time, as many of them as allowed up to the first one after which some node dies.
+        Broadcasts after it are only performed once MST is repaired.
+        :param position: Position of the first broadcast not performed yet in the list of broadcasts
+        :param alive_ids: The IDs of the nodes still alive
+        :return: The IDs of the nodes that initiate the broadcasts and the position of the first broadcast after them
+        """
+        senders, positions = [], []
+        while position < len(self.bcsts) and len(senders) < self.concurrent_broadcasts:
+            if self.bcsts[position] in alive_ids:
+                senders.append(self.bcsts[position])
+                positions.append(position)
+            position += 1
+        if len(senders) > 1:
+            count = self.planner.count_until_death(self.nodes, senders)
+            senders, position = senders[:count], positions[count - 1] + 1
+        return senders, position
+
+    def stop(self):
+        """
+        Stop everything started for the simulation and make sure everything is logged.
+        """
+        global active
+        if MST.backend is not None:
+            MST.backend.stop()
+            MST.backend = None
+        MST.cache = None
+        MST.topology = None
+        MST.asynchronous = False
+        if self.nodes:
+            MST.workers.retire(self.nodes)
+        if self.metrics_file:
+            metrics.export(self.metrics_file)
+            metrics.disable()
+        flush_log()
+        active = None
+
+    def verify_MST(self):
+        """
+        Raise VerificationError if MST found by the nodes differs from the centrally found MST.
+        """
+        if not self.verify:
+            return
+        missing, unexpected = fastMST.verify_MST(self.nodes)
+        if missing or unexpected:
+            raise VerificationError('MST verification failed, missing links: %s, unexpected links: %s'
+                                    % (missing, unexpected))
@@ -0,0 +1,149 @@
+from simulation import Simulation, VerificationError
+import multiprocessing
+import Queue
+import json
+import time
+import os
+
+
+def run_simulation(index, parameters, results):
+    """
+    Run a single simulation. Done in a separate process, so every simulation starts from a clean state and any number
+    of them can run at the same time.
+    :param index: Index of the run, put into the results together with its outcome
+    :param parameters: Keyword arguments of Simulation
+    :param results: Queue to put the outcome of the run into
+    """
+    try:
+        nodes = Simulation(**parameters).run()
+    except VerificationError as error:
+        results.put((index, {'status': 'failed', 'error': str(error)}))
+        return
+    results.put((index, {'status': 'ok', 'nodes_alive': len(nodes)}))
+
+
+def get_runs(input_files, engines, output_directory, **parameters):
+    """
+    Make a run for every combination of the input file and engine, each logging into its own file in the output
+    directory.
+    :param input_files: Files describing the networks and the broadcasts
+    :param engines: Engines to run every file with ('distributed', 'events' and/or 'fast')
+    :param output_directory: Directory to write the logs (and the metrics if asked to) into
+    :param parameters: Other keyword arguments of Simulation, same for all the runs
+    :return: List of keyword arguments of Simulation, one for every run
+    """
+    runs = []
+    extension = 'trace' if parameters.get('binary_trace') else 'log'
+    for input_file in input_files:
+        name = os.path.splitext(os.path.basename(input_file))[0]
+        for engine in engines:
+            run = dict(parameters, input_file=input_file, engine=engine,
+                       log_file=os.path.join(output_directory, '%s-%s.%s' % (name, engine, extension)))
+            if parameters.get('metrics_file'):
+                run['metrics_file'] = os.path.join(output_directory, '%s-%s.metrics.json' % (name, engine))
+            runs.append(run)
+    return runs
+
+
+def sweep(runs, processes=None, timeout=None):
+    """
+    Run all the simulations, at most the given number of them at the same time.
+    :param runs: List of keyword arguments of Simulation, one for every run
+    :param processes: Maximum number of simulations running at the same time, number of CPUs by default
+    :param timeout: Seconds after which a simulation is stopped, None to wait as long as it takes
+    :return: List of outcomes, one for every run in the same order. Every outcome has the status of the run ('ok',
+            'timeout' or 'failed') and its total time
+    """
+    processes = processes or multiprocessing.cpu_count()
+    outcomes = [None] * len(runs)
+    results = multiprocessing.Queue()
+    waiting = list(enumerate(runs))
+    waiting.reverse()
+    running = {}
+    while waiting or running:
+        while waiting and len(running) < processes:
+            index, parameters = waiting.pop()
+            # Logs are appended to, so a log left from some previous sweep is removed first
+            if os.path.exists(parameters['log_file']):
+                os.remove(parameters['log_file'])
+            process = multiprocessing.Process(target=run_simulation, args=(index, parameters, results))
+            process.start()
+            running[index] = (process, time.time())
+
+        try:
+            index, outcome = results.get(timeout=0.1)
+            process, start = running.pop(index)
+            process.join()
+            outcome['total'] = time.time() - start
+            outcomes[index] = outcome
+        except Queue.Empty:
+            pass
+
+        for index, (process, start) in running.items():
+            if timeout is not None and time.time() - start > timeout:
+                process.terminate()
+                status = 'timeout'
+            elif not process.is_alive() and results.empty():
+                # Ended without putting its outcome into the queue
+                status = 'failed'
+            else:
+                continue
+            process.join()
+            del running[index]
+            outcomes[index] = {'status': status, 'total': time.time() - start}
+    return outcomes
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Run many networks at the same time, each logging into its own file.')
+    parser.add_argument('inputs', nargs='+', help='Files describing the networks and the broadcasts')
+    parser.add_argument('--engine', choices=['distributed', 'events', 'fast'], nargs='+', default=['distributed'],
+                        help='Engines to run every file with')
+    parser.add_argument('--output-dir', default='sweep', help='Directory to write the logs into')
+    parser.add_argument('--processes', type=int, help='Number of networks run at the same time. Number of CPUs by '
+                                                      'default')
+    parser.add_argument('--timeout', type=float, help='Seconds after which a run is stopped')
+    parser.add_argument('--shards', type=int, default=0, help='Number of processes to run the nodes of every network '
+                                                              'in (see main.py)')
+    parser.add_argument('--verify', action='store_true',
+                        help='Cross-check every MST found by the nodes against the centrally found MST')
+    parser.add_argument('--simulate-broadcasts', action='store_true',
+                        help='Let the nodes flood every broadcast themselves instead of accounting it centrally')
+    parser.add_argument('--concurrent-broadcasts', type=int, default=1, metavar='N',
+                        help='Let the nodes perform up to N broadcasts at the same time (see main.py)')
+    parser.add_argument('--compact-topology', action='store_true',
+                        help='Keep the neighbors of all the nodes in a single compact store (see main.py)')
+    parser.add_argument('--trace', action='store_true',
+                        help='Write the logs as binary traces instead of text (see binaryTrace.py)')
+    parser.add_argument('--cache', metavar='DIRECTORY', help='Directory to keep the found MSTs in, shared by all '
+                                                             'the runs')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='The lowest latency of a link in seconds of virtual time (see main.py)')
+    parser.add_argument('--latency-spread', type=float, default=0.0,
+                        help='How much higher than the lowest latency the latency of a link can be')
+    parser.add_argument('--latency-seed', type=int, default=0, help='Seed choosing the latencies of the links')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Record the metrics of every run into the output directory')
+    parser.add_argument('--asynchronous', action='store_true',
+                        help='Find MST with asynchronous GHS algorithm (see main.py)')
+    parser.add_argument('--summary', help='File to write the outcomes of all the runs into as JSON')
+    options = parser.parse_args()
+
+    if not os.path.isdir(options.output_dir):
+        os.makedirs(options.output_dir)
+    runs = get_runs(options.inputs, options.engine, options.output_dir, shards=options.shards,
+                    verify=options.verify, simulate_broadcasts=options.simulate_broadcasts,
+                    cache_directory=options.cache, metrics_file=options.metrics, latency=options.latency,
+                    latency_spread=options.latency_spread, latency_seed=options.latency_seed,
+                    concurrent_broadcasts=options.concurrent_broadcasts,
+                    compact_topology=options.compact_topology, binary_trace=options.trace,
+                    asynchronous=options.asynchronous)
+    outcomes = sweep(runs, options.processes, options.timeout)
+    for run, outcome in zip(runs, outcomes):
+        outcome.update(input=run['input_file'], engine=run['engine'], log=run['log_file'])
+        print('%(input)s, %(engine)s: %(status)s in %(total).3fs, logged into %(log)s' % outcome)
+    if options.summary:
+        f = open(options.summary, 'w')
+        json.dump({'time': time.time(), 'runs': outcomes}, f, indent=2, sort_keys=True)
+        f.close()
@@ -0,0 +1,349 @@
+from array import array
+import bisect
+import heapq
+import mmap
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class NeighborView(object):
+    """
+    Read-only view of the neighbors of a single node kept in TopologyStore. Behaves as the dictionary node keeps before
+    the store is built (see Node.update_neighbors) - maps neighbor ID to the position of the neighbor and the distance
+    to it - without keeping anything of its own.
+    """
+    __slots__ = ('store', 'row', 'start', 'end', 'removed')
+
+    def __init__(self, store, row, removed=frozenset()):
+        """
+        :param store: The store keeping the neighbors
+        :param row: Row of the node in the store
+        :param removed: IDs of the neighbors that are not neighbors any more (see without)
+        """
+        self.store = store
+        self.row = row
+        self.start = int(store.offsets[row])
+        self.end = int(store.offsets[row + 1])
+        self.removed = removed
+
+    def find(self, neighbor_id):
+        """
+        :param neighbor_id: ID of the neighbor
+        :return: Index of the link to the neighbor in the store, -1 if the node has no such neighbor
+        """
+        if neighbor_id in self.removed:
+            return -1
+        index = bisect.bisect_left(self.store.neighbors, neighbor_id, self.start, self.end)
+        if index < self.end and self.store.neighbors[index] == neighbor_id:
+            return index
+        return -1
+
+    def __contains__(self, neighbor_id):
+        return self.find(neighbor_id) >= 0
+
+    def __getitem__(self, neighbor_id):
+        index = self.find(neighbor_id)
+        if index < 0:
+            raise KeyError(neighbor_id)
+        return self.store.get_position(neighbor_id), float(self.store.distances[index])
+
+    def __iter__(self):
+        for index in xrange(self.start, self.end):
+            neighbor_id = int(self.store.neighbors[index])
+            if neighbor_id not in self.removed:
+                yield neighbor_id
+
+    def __len__(self):
+        return self.end - self.start - len(self.removed)
+
+    def items(self):
+        return [(neighbor_id, self[neighbor_id]) for neighbor_id in self]
+
+    def get_candidates(self, node_id):
+        """
+        :param node_id: ID of the node the neighbors belong to
+        :return: Links to all the neighbors in the order of their distance (see Candidates)
+        """
+        return Candidates(self, node_id)
+
+    def without(self, node_ids):
+        """
+        :param node_ids: IDs of the nodes to forget about
+        :return: View of the same neighbors except the given nodes
+        """
+        removed = set(node_id for node_id in node_ids if node_id in self)
+        if not removed:
+            return self
+        return NeighborView(self.store, self.row, self.removed | removed)
+
+    def __reduce__(self):
+        # Kept as a plain dictionary then pickled (see mstCache.py), the store itself is not
+        return dict, (self.items(),)
+
+
+class TreeView(object):
+    """
+    View of the neighbors a single node kept in TopologyStore has a link of MST with. Behaves as the list
+    node keeps then its neighbors are not in the store (see Node.store_link) - neighbor IDs in the order of the links -
+    but the order is kept in the store, as the rank of every link of the node in MST (0 for the links not in MST).
+    """
+    __slots__ = ('store', 'row', 'start', 'end')
+
+    def __init__(self, store, row):
+        """
+        :param store: The store keeping the links
+        :param row: Row of the node in the store
+        """
+        self.store = store
+        self.row = row
+        self.start = int(store.offsets[row])
+        self.end = int(store.offsets[row + 1])
+
+    def get_links(self):
+        """
+        :return: Indexes of the links of the node in MST in the store, in the order of their ranks
+        """
+        ranks = self.store.tree[self.start:self.end]
+        return [index for _, index in sorted((rank, index) for index, rank in enumerate(ranks, self.start) if rank)]
+
+    def __contains__(self, neighbor_id):
+        index = bisect.bisect_left(self.store.neighbors, neighbor_id, self.start, self.end)
+        return index < self.end and self.store.neighbors[index] == neighbor_id and self.store.tree[index] > 0
+
+    def __iter__(self):
+        return iter([int(self.store.neighbors[index]) for index in self.get_links()])
+
+    def __len__(self):
+        return self.end - self.start - self.store.tree[self.start:self.end].count(0)
+
+    def append(self, neighbor_id):
+        """
+        Add the link to the neighbor into MST after all the other links of the node.
+        :param neighbor_id: ID of the neighbor
+        """
+        self.store.tree[bisect.bisect_left(self.store.neighbors, neighbor_id, self.start, self.end)] = len(self) + 1
+
+    def sort(self, key):
+        """
+        Put the links of the node in MST into another order.
+        :param key: Function mapping neighbor ID to the key the links are sorted by
+        """
+        for rank, neighbor_id in enumerate(sorted(self, key=key), 1):
+            self.store.tree[bisect.bisect_left(self.store.neighbors, neighbor_id, self.start, self.end)] = rank
+
+    def clear(self):
+        """
+        Remove all the links of the node from MST.
+        """
+        self.store.tree[self.start:self.end] = array('B', [0]) * (self.end - self.start)
+
+    def __reduce__(self):
+        # Kept as a plain list then pickled (see mstCache.py), the store itself is not
+        return list, (list(self),)
+
+
+class Candidates(object):
+    """
+    Links of a node to its neighbors in the order of their distance (then of the neighbor IDs), read from the store.
+    Used instead of CandidateHeap then the neighbors are kept in the store, same as the heap only the cheapest link is
+    ever looked at or skipped (see Node.find_cheapest_link).
+    """
+    __slots__ = ('view', 'node_id', 'position')
+
+    def __init__(self, view, node_id):
+        """
+        :param view: Neighbors of the node
+        :param node_id: ID of the node
+        """
+        self.view = view
+        self.node_id = node_id
+        self.position = view.start
+        self.skip_removed()
+
+    def skip_removed(self):
+        store = self.view.store
+        while self.position < self.view.end and store.neighbors[store.order[self.position]] in self.view.removed:
+            self.position += 1
+
+    def __nonzero__(self):
+        return self.position < self.view.end
+
+    def __getitem__(self, index):
+        # Only the cheapest link is ever looked at
+        if index != 0 or not self:
+            raise IndexError(index)
+        store = self.view.store
+        link = store.order[self.position]
+        return float(store.distances[link]), (self.node_id, int(store.neighbors[link]))
+
+    def skip(self):
+        """
+        Forget the cheapest link.
+        """
+        self.position += 1
+        self.skip_removed()
+
+
+class CandidateHeap(list):
+    """
+    Heap of the links of a node to its neighbors in the form (distance, (node ID, neighbor ID)), used then the node
+    keeps its neighbors by itself.
+    """
+
+    def push(self, link):
+        heapq.heappush(self, link)
+
+    def skip(self):
+        """
+        Forget the cheapest link.
+        """
+        heapq.heappop(self)
+
+
+def get_candidates(node_id, neighbors):
+    """
+    Get the links of a node to all its neighbors, so that the cheapest of them can be found and skipped.
+    :param node_id: ID of the node
+    :param neighbors: Dictionary or NeighborView mapping neighbor ID to its position and distance to it
+    :return: CandidateHeap or Candidates with all the links
+    """
+    if isinstance(neighbors, NeighborView):
+        return neighbors.get_candidates(node_id)
+    candidates = CandidateHeap((distance, (node_id, neighbor_id)) for neighbor_id, (_, distance) in neighbors.items())
+    heapq.heapify(candidates)
+    return candidates
+
+
+def get_tree(neighbors):
+    """
+    Get the empty list of the neighbors a node has a link of MST with, kept in the store if the neighbors are.
+    :param neighbors: Dictionary or NeighborView mapping neighbor ID to its position and distance to it
+    :return: List or TreeView with no neighbors in it
+    """
+    if isinstance(neighbors, NeighborView):
+        tree = TreeView(neighbors.store, neighbors.row)
+        tree.clear()
+        return tree
+    return []
+
+
+def without(neighbors, node_ids):
+    """
+    Forget about the given nodes in the neighbors of a node, whether they are kept in a dictionary or in the store.
+    :param neighbors: Dictionary or NeighborView mapping neighbor ID to its position and distance to it
+    :param node_ids: IDs of the nodes to forget about
+    :return: The neighbors without the given nodes
+    """
+    if isinstance(neighbors, NeighborView):
+        return neighbors.without(node_ids)
+    return dict((neighbor_id, neighbor) for neighbor_id, neighbor in neighbors.items() if neighbor_id not in node_ids)
+
+
+class TopologyStore:
+    """
+    Neighbors of all the nodes of the network kept in compressed sparse rows instead of a dictionary in every node.
+    Nodes are in rows ordered by their IDs. Links of the node in row r are at indexes offsets[r] to offsets[r + 1]
+    ordered by the neighbor IDs: neighbor IDs (int32) and distances (float64, so that the energies spent on the links
+    are exactly the same). The same indexes of order (int32) hold the indexes of the links of the row in the order of
+    their distance (see Candidates), and the same indexes of tree (uint8) hold the ranks of the links in MST of their
+    rows (see TreeView). Node in the plane never has more than 6 links in MST, so the ranks stay small.
+    The store is built once the nodes discovered their neighbors and only the links in MST change after that - dead
+    nodes are only hidden by the views (see NeighborView.without). It can be kept in a memory-mapped file (requires
+    NumPy), so that only the parts of it in use need to be in memory. Links in MST are always kept in memory.
+    """
+
+    def __init__(self, file_name=None):
+        """
+        :param file_name: File to keep the store in, None to keep it in memory
+        """
+        if file_name is not None and numpy is None:
+            raise ImportError('NumPy is required to keep the topology in a memory-mapped file')
+        self.file_name = file_name
+        self.ids = array('i')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.offsets = array('l', [0])
+        self.neighbors = array('i')
+        self.distances = array('d')
+        self.order = array('i')
+        self.tree = array('B')
+
+    def build(self, nodes):
+        """
+        Build the store from the neighbors known by the nodes and replace the neighbors of every node and its links in
+        MST by their views.
+        :param nodes: List of all known nodes
+        """
+        ordered = sorted(nodes, key=lambda node: node.node_id)
+        # Links in MST might be kept in the previous columns of the store
+        trees = [list(node.tree_neighbors) for node in ordered]
+        ids, xs, ys = array('i'), array('d'), array('d')
+        offsets, neighbors, distances, order = array('l', [0]), array('i'), array('d'), array('i')
+        for node in ordered:
+            ids.append(node.node_id)
+            xs.append(node.position[0])
+            ys.append(node.position[1])
+            start = len(neighbors)
+            links = sorted((neighbor_id, distance) for neighbor_id, (_, distance) in node.neighbors.items())
+            for neighbor_id, distance in links:
+                neighbors.append(neighbor_id)
+                distances.append(distance)
+            order.extend(start + index for _, _, index in
+                         sorted((distance, neighbor_id, index) for index, (neighbor_id, distance) in enumerate(links)))
+            offsets.append(len(neighbors))
+        columns = [ids, xs, ys, offsets, neighbors, distances, order]
+        if self.file_name is not None:
+            columns = self.map_columns(columns)
+        self.ids, self.xs, self.ys, self.offsets, self.neighbors, self.distances, self.order = columns
+        self.tree = array('B', [0]) * len(neighbors)
+        for row, node in enumerate(ordered):
+            node.neighbors = NeighborView(self, row)
+            node.candidates = node.neighbors.get_candidates(node.node_id)
+            node.index_mst([(node.node_id, neighbor_id) for neighbor_id in trees[row]])
+
+    def map_columns(self, columns):
+        """
+        Write the columns into the file of the store and memory-map them back.
+        :param columns: The arrays to keep in the file
+        :return: NumPy arrays of the same columns read from the memory-mapped file
+        """
+        f = open(self.file_name, 'w+b')
+        for column in columns:
+            column.tofile(f)
+        f.flush()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        mapped_columns = []
+        offset = 0
+        for column in columns:
+            mapped_columns.append(numpy.frombuffer(mapped, dtype=column.typecode, count=len(column), offset=offset))
+            offset += len(column) * column.itemsize
+        return mapped_columns
+
+    def holds(self, nodes):
+        """
+        :param nodes: List of nodes
+        :return: True if the neighbors of all the nodes are kept in this store
+        """
+        return all(isinstance(node.neighbors, NeighborView) and node.neighbors.store is self for node in nodes)
+
+    def get_row(self, node_id):
+        """
+        :param node_id: ID of the node
+        :return: Row of the node in the store
+        """
+        row = bisect.bisect_left(self.ids, node_id)
+        if row == len(self.ids) or self.ids[row] != node_id:
+            raise KeyError(node_id)
+        return row
+
+    def get_position(self, node_id):
+        """
+        :param node_id: ID of the node
+        :return: Position of the node in the form (x, y)
+        """
+        row = self.get_row(node_id)
+        return float(self.xs[row]), float(self.ys[row])
@@ -0,0 +1,89 @@
+import threading
+import Queue
+
+
+class NodeWorker(threading.Thread):
+    """ Long-lived thread that performs all the actions of a single node """
+
+    def __init__(self, node):
+        """
+        Create and start a new worker for the given node. The worker then sits idle until it is handed an action.
+        :param node: The node this worker is performing actions for
+        """
+        threading.Thread.__init__(self, name='node-%s' % node.node_id)
+        self.daemon = True
+        self.node = node
+        self.commands = Queue.Queue()
+        self.start()
+
+    def run(self):
+        """
+        Wait for the actions and perform them one at the time. After an action is finished - report it back to
+        whoever handed it. Stop then None is received instead of an action.
+        """
+        while True:
+            command = self.commands.get()
+            if command is None:
+                break
+            target, args, done = command
+            try:
+                target(*args)
+            finally:
+                done.put(self.node.node_id)
+
+
+class WorkerPool:
+    """ Pool of node workers that stay alive and are reused for every phase of the algorithm """
+
+    def __init__(self):
+        self.workers = {}
+
+    def get_worker(self, node):
+        """
+        Find the worker of the given node, start a new one if node does not have a worker yet.
+        :param node: The node to find worker for
+        :return: The worker of the node
+        """
+        worker = self.workers.get(node.node_id)
+        if worker is None or worker.node is not node:
+            if worker is not None:
+                worker.commands.put(None)
+            worker = NodeWorker(node)
+            self.workers[node.node_id] = worker
+        return worker
+
+    def submit(self, tasks):
+        """
+        Hand the actions to the workers of the nodes.
+        :param tasks: List of tasks in the form (node, target, args), where target is the function to be called
+                    with given args by the worker of the node
+        :return: Queue to which the workers report finished tasks. See wait.
+        """
+        done = Queue.Queue()
+        for node, target, args in tasks:
+            self.get_worker(node).commands.put((target, args, done))
+        return done
+
+    def wait(self, done, count):
+        """
+        Wait for the given number of tasks to finish.
+        :param done: Queue returned by submit
+        :param count: Number of submitted tasks
+        """
+        for _ in range(count):
+            done.get()
+
+    def retire(self, nodes):
+        """
+        Stop the workers of the given nodes and wait for them to finish. Done then nodes are no longer part of the
+        network.
+        :param nodes: List of nodes
+        """
+        stopped = []
+        for node in nodes:
+            worker = self.workers.pop(node.node_id, None)
+            if worker is not None:
+                worker.commands.put(None)
+                stopped.append(worker)
+        for worker in stopped:
+            worker.join()
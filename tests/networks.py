@@ -0,0 +1,42 @@
+import random
+
+# Node 2 in the middle of the line and node 5 on its own start below the minimum budget
+LOW_ENERGY_NETWORK = """50.0
+node 1, 0, 0, 100
+node 2, 5, 0, 30
+node 3, 10, 0, 100
+node 4, 15, 0, 100
+node 5, 50, 50, 20
+bcst from 1
+bcst from 4
+"""
+
+# Two pairs of nodes 4 apart with two links of the same length 5 between the pairs. Nodes that compared the links from
+# their own end picked a different one of the two links in each pair and closed a cycle
+RECTANGLE_NETWORK = """1.0
+node 1, 0, 0, 100
+node 2, 0, 4, 100
+node 3, 5, 4, 100
+node 4, 5, 0, 100
+bcst from 1
+"""
+
+
+def generate_grid_network(nodes, side, seed, broadcasts=10):
+    """
+    Generate a network of nodes placed on distinct points of an integer grid, so that a lot of the links are equally
+    long.
+    :param nodes: Number of nodes
+    :param side: Number of points of the grid along each of the axes
+    :param seed: Seed of the random number generator
+    :param broadcasts: Number of broadcasts, each from a randomly chosen node
+    :return: Contents of the input file
+    """
+    generator = random.Random(seed)
+    positions = generator.sample([(x, y) for x in range(side) for y in range(side)], nodes)
+    lines = ['20.0']
+    for node_id, (x, y) in enumerate(positions, 1):
+        lines.append('node %d, %d, %d, %r' % (node_id, x, y, generator.uniform(30.0, 60.0)))
+    for _ in range(broadcasts):
+        lines.append('bcst from %d' % generator.randint(1, nodes))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import time
+
+CODE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'code')
+
+
+def run_main(directory, network, timeout, *options):
+    """
+    Run main.py over the network in a separate process.
+    :param directory: Directory to write the input file and the log into
+    :param network: Contents of the input file
+    :param timeout: Number of seconds after which the run is killed
+    :param options: Additional command line options
+    :return: The exit code (None if the run was killed) and the lines logged
+    """
+    input_file = os.path.join(directory, 'input.txt')
+    log_file = os.path.join(directory, 'log.txt')
+    f = open(input_file, 'w')
+    f.write(network)
+    f.close()
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    process = subprocess.Popen([sys.executable, os.path.join(CODE, 'main.py'), input_file, '--log', log_file] +
+                               list(options), stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    deadline = time.time() + timeout
+    while process.poll() is None and time.time() < deadline:
+        time.sleep(0.1)
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+        return None, []
+    f = open(log_file)
+    lines = f.read().splitlines()
+    f.close()
+    return process.returncode, lines
+
+
+def sort_added_links(lines):
+    """
+    :param lines: Lines logged by a run
+    :return: The same lines with every run of the lines about the added links sorted
+    """
+    result = []
+    added = []
+    for line in lines:
+        if line.startswith('added'):
+            added.append(line)
+            continue
+        result.extend(sorted(added))
+        added = []
+        result.append(line)
+    return result + sorted(added)
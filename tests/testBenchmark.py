@@ -0,0 +1,49 @@
+import os
+import Queue
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE
+from networks import LOW_ENERGY_NETWORK
+
+sys.path.insert(0, CODE)
+import benchmark
+import metrics
+
+
+class RunCaseTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'input.txt')
+        f = open(self.input_file, 'w')
+        f.write(LOW_ENERGY_NETWORK)
+        f.close()
+        # Every case logs into log.txt in the working directory
+        self.working_directory = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        metrics.disable()
+        shutil.rmtree(self.directory)
+
+    def run_case(self, collect_metrics=False):
+        results = Queue.Queue()
+        benchmark.run_case(self.input_file, 'events', results, collect_metrics)
+        return results.get_nowait()
+
+    def test_timed_run_without_metrics(self):
+        result = self.run_case()
+        self.assertFalse(metrics.enabled)
+        self.assertFalse('metrics' in result)
+        self.assertEqual(sorted(result['timings']), ['broadcasts', 'find_MST', 'parse'])
+
+    def test_metrics_collected_if_asked_for(self):
+        result = self.run_case(collect_metrics=True)
+        self.assertTrue(result['metrics']['messages'])
+        self.assertEqual(result['nodes_alive'], self.run_case()['nodes_alive'])
+
+
+if __name__ == '__main__':
+    unittest.main()
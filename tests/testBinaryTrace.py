@@ -0,0 +1,67 @@
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+from runMain import CODE
+from networks import generate_grid_network
+
+sys.path.insert(0, CODE)
+from simulation import Simulation
+import binaryTrace
+
+
+class BinaryTraceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'input.txt')
+        f = open(self.input_file, 'w')
+        # Nodes die during the broadcasts, so every type of the lines is logged
+        f.write(generate_grid_network(40, 20, seed=1, broadcasts=40))
+        f.close()
+        self.numpy = binaryTrace.numpy
+
+    def tearDown(self):
+        binaryTrace.numpy = self.numpy
+        shutil.rmtree(self.directory)
+
+    def run_simulation(self, binary_trace):
+        """
+        :return: The file the run logged into
+        """
+        log_file = os.path.join(self.directory, 'trace.bin' if binary_trace else 'log.txt')
+        Simulation(self.input_file, log_file=log_file, engine='events', binary_trace=binary_trace).run()
+        return log_file
+
+    def convert(self, trace_file, node_id=None, types=None):
+        output = StringIO.StringIO()
+        binaryTrace.convert(trace_file, output, node_id, types)
+        return output.getvalue().splitlines()
+
+    def test_same_as_text_log(self):
+        f = open(self.run_simulation(False))
+        lines = f.read().splitlines()
+        f.close()
+        self.assertEqual(set(line.split()[0] for line in lines), set(['bs', 'added', 'elected', 'node', 'data']))
+        for line in lines:
+            records = binaryTrace.parse_line(line)
+            packed = binaryTrace.pack(records)
+            self.assertEqual(len(packed), len(records) * binaryTrace.RECORD.size)
+            self.assertEqual(binaryTrace.format_line(records), line)
+
+        trace_file = self.run_simulation(True)
+        self.assertEqual(self.convert(trace_file), lines)
+        node_id = int(lines[-1].split()[2])
+        node_lines = [line for line in lines if binaryTrace.touches(binaryTrace.parse_line(line), node_id)]
+        data_lines = [line for line in node_lines if line.startswith('data from')]
+        self.assertTrue(data_lines)
+        # Lines of a single node are found with NumPy if it is installed, the same as without it
+        for numpy in (self.numpy, None):
+            binaryTrace.numpy = numpy
+            self.assertEqual(self.convert(trace_file, node_id), node_lines)
+            self.assertEqual(self.convert(trace_file, node_id, set([binaryTrace.DATA])), data_lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE
+from networks import LOW_ENERGY_NETWORK, generate_grid_network
+
+sys.path.insert(0, CODE)
+from simulation import Simulation
+import broadcastScheduler
+
+
+class EnergyStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.numpy = broadcastScheduler.numpy
+
+    def tearDown(self):
+        broadcastScheduler.numpy = self.numpy
+        shutil.rmtree(self.directory)
+
+    def run_simulation(self, network):
+        """
+        Find MST of the network and perform all its broadcasts with the scheduler, repairing MST as the nodes die.
+        :return: The logged lines and the energies of the nodes still alive
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        log_file = os.path.join(self.directory, 'log.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        nodes = Simulation(input_file, log_file=log_file, engine='events').run()
+        f = open(log_file)
+        lines = f.read().splitlines()
+        f.close()
+        return lines, dict((node.node_id, node.energy) for node in nodes)
+
+    @unittest.skipIf(broadcastScheduler.numpy is None, 'NumPy is not installed')
+    def test_same_as_accounting_every_node(self):
+        for network in (LOW_ENERGY_NETWORK, generate_grid_network(40, 20, seed=1, broadcasts=40)):
+            lines, energies = self.run_simulation(network)
+            self.assertTrue([line for line in lines if line.startswith('data from')])
+            broadcastScheduler.numpy = None
+            self.assertEqual(self.run_simulation(network), (lines, energies))
+            broadcastScheduler.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
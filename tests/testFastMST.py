@@ -0,0 +1,39 @@
+import shutil
+import tempfile
+import unittest
+from runMain import run_main, sort_added_links
+from networks import LOW_ENERGY_NETWORK, RECTANGLE_NETWORK, generate_grid_network
+
+
+class FastMSTTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_nodes_below_minimum_budget_die(self):
+        returncode, lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'fast')
+        self.assertEqual(returncode, 0)
+        self.assertIn('node down 2', lines)
+        self.assertIn('node down 5', lines)
+        # The discrete-event engine logs everything in the same order as the fast engine
+        _, event_lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events')
+        self.assertEqual(lines, event_lines)
+        # Links added within the same level may be logged in any order by the nodes running in threads
+        _, distributed_lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'distributed')
+        self.assertEqual(sorted(lines), sorted(distributed_lines))
+
+    def test_equally_long_links(self):
+        for network in (RECTANGLE_NETWORK, generate_grid_network(40, 20, seed=1)):
+            returncode, event_lines = run_main(self.directory, network, 60, '--engine', 'events', '--verify')
+            self.assertEqual(returncode, 0)
+            returncode, lines = run_main(self.directory, network, 60, '--engine', 'fast')
+            self.assertEqual(returncode, 0)
+            # The fast engine logs the links added at the same level in the order of the leaders, not in the order
+            # they are found in
+            self.assertEqual(sort_added_links(lines), sort_added_links(event_lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE, run_main
+from networks import LOW_ENERGY_NETWORK, RECTANGLE_NETWORK, generate_grid_network
+
+sys.path.insert(0, CODE)
+from Node import Node
+import MST
+
+
+def get_broadcast_lines(lines):
+    """
+    :param lines: Lines logged by a run
+    :return: The lines logged about the data transfers and the dead nodes
+    """
+    return [line for line in lines if line.startswith('data from') or line.startswith('node down')]
+
+
+class AsynchronousTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_nodes_below_minimum_budget_die(self):
+        returncode, lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events', '--asynchronous')
+        self.assertEqual(returncode, 0)
+        self.assertIn('node down 5', lines)
+        _, synchronous_lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events')
+        self.assertEqual(lines, synchronous_lines)
+
+    def test_equally_long_links(self):
+        for network in (RECTANGLE_NETWORK, generate_grid_network(40, 20, seed=1)):
+            returncode, lines = run_main(self.directory, network, 60, '--engine', 'events', '--asynchronous',
+                                         '--verify')
+            self.assertEqual(returncode, 0)
+            _, synchronous_lines = run_main(self.directory, network, 60, '--engine', 'events')
+            # The same MST is found, so the data is sent over the same links and the same nodes die
+            self.assertEqual(get_broadcast_lines(lines), get_broadcast_lines(synchronous_lines))
+            self.assertEqual(sorted(line for line in lines if line.startswith('added')),
+                             sorted(line for line in synchronous_lines if line.startswith('added')))
+
+
+class NeighborGridTest(unittest.TestCase):
+    def generate_nodes(self, seed):
+        """
+        Generate nodes at random positions, some of them exactly on the borders of the cells of the grid and some
+        exactly R apart.
+        :param seed: Seed of the random number generator
+        :return: List of the nodes
+        """
+        generator = random.Random(seed)
+        positions = [(generator.uniform(-50.0, 50.0), generator.uniform(-50.0, 50.0)) for _ in range(150)]
+        positions += [(float(generator.randint(-5, 5) * MST.R), float(generator.randint(-5, 5) * MST.R))
+                      for _ in range(30)]
+        positions += [(x + MST.R, y) for x, y in positions[:20]]
+        message_queue = {}
+        return [Node(node_id, position, 100.0, message_queue) for node_id, position in enumerate(positions, 1)]
+
+    def get_discovered(self, nodes, grid):
+        """
+        :return: Dictionary mapping the ID of every node to the list of the IDs of the nodes it got discover messages
+                from, in the order they were sent
+        """
+        for node in nodes:
+            MST.reach_neighbors(nodes, node.node_id, node.position, grid)
+        discovered = {}
+        for node in nodes:
+            queue = node.message_queue[node.node_id]
+            discovered[node.node_id] = [queue.get_nowait()[1] for _ in range(queue.qsize())]
+        return discovered
+
+    def test_same_as_pairwise_scan(self):
+        for seed in range(5):
+            nodes = self.generate_nodes(seed)
+            grid = MST.build_grid(nodes)
+            for node in nodes:
+                within_range = [other for other in nodes if MST.find_distance(node.position, other.position) <= MST.R]
+                self.assertEqual([other for other in MST.nearby_nodes(grid, node.position) if other in within_range],
+                                 within_range)
+            discovered = self.get_discovered(nodes, grid)
+            self.assertEqual(discovered, self.get_discovered(nodes, None))
+            self.assertTrue(any(discovered.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
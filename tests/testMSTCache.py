@@ -0,0 +1,30 @@
+import os
+import shutil
+import tempfile
+import unittest
+from runMain import run_main
+from networks import LOW_ENERGY_NETWORK
+
+
+class MSTCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit_logs_same_as_miss(self):
+        returncode, lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events',
+                                     '--cache', self.cache_directory)
+        self.assertEqual(returncode, 0)
+        self.assertTrue(os.listdir(self.cache_directory))
+        self.assertIn('node down 2', lines)
+        returncode, cached_lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events',
+                                            '--cache', self.cache_directory)
+        self.assertEqual(returncode, 0)
+        self.assertEqual(lines, cached_lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE, run_main
+from networks import generate_grid_network
+
+sys.path.insert(0, CODE)
+from messages import Message, MY_CURRENT_MST
+from simulation import Simulation
+from Node import Node
+
+# Nodes only know the MST links between their own neighbors, so without asking the neighbor first some node of this
+# network picked a link into its own connected component, closed a cycle and the floods never stopped
+CYCLE_NETWORK = """5.0
+node 1, 13.399103873948091, 12.076337074966814, 25.374569764496048
+node 2, 7.833516539872102, 7.1070777631336215, 30.20276102957687
+node 3, 12.47081116674487, 1.4840503722439926, 46.063718908910516
+node 4, 13.214606586370541, 6.842648154463612, 21.133899060880253
+node 5, 0.033299627316700484, 7.042189869422887, 50.49120329831768
+node 6, 3.6170483090702406, 14.94604201680997, 48.8616012936313
+node 7, 0.4836700998596805, 0.4023343888168553, 56.057098304459345
+node 8, 14.849252085101606, 6.027368224014756, 41.65649891173986
+node 9, 6.674249084760022, 0.45917516890850174, 28.663975885224534
+node 10, 6.923610775330466, 7.839479872799193, 28.8676666509214
+bcst from 3
+bcst from 3
+bcst from 3
+bcst from 5
+"""
+
+
+class CheapestLinkTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_link_inside_component_is_rejected(self):
+        returncode, lines = run_main(self.directory, CYCLE_NETWORK, 60, '--verify')
+        self.assertEqual(returncode, 0)
+        fast_returncode, fast_lines = run_main(self.directory, CYCLE_NETWORK, 60, '--engine', 'fast')
+        self.assertEqual(fast_returncode, 0)
+        # Links added within the same level may be logged in any order
+        self.assertEqual(sorted(lines), sorted(fast_lines))
+
+
+def send_whole_mst(node, message_id, neighbor_id):
+    """
+    Send the neighbor all the links of node's MST, no matter which of them it already knows about.
+    """
+    node.send_neighbor(message_id, Message(MY_CURRENT_MST, node.get_mst()), neighbor_id)
+
+
+class CurrentMSTTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.send_current_mst = Node.__dict__['send_current_mst']
+
+    def tearDown(self):
+        Node.send_current_mst = self.send_current_mst
+        shutil.rmtree(self.directory)
+
+    def run_simulation(self, network):
+        """
+        Find MST of the network and perform all its broadcasts, repairing MST as the nodes die.
+        :return: The logged lines and dictionary mapping the ID of every alive node to the set of links in its MST
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        log_file = os.path.join(self.directory, 'log.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        nodes = Simulation(input_file, log_file=log_file, engine='events', verify=True).run()
+        f = open(log_file)
+        lines = f.read().splitlines()
+        f.close()
+        return lines, dict((node.node_id, set((min(link), max(link)) for link in node.get_mst())) for node in nodes)
+
+    def test_same_as_sending_whole_mst(self):
+        for seed in range(3):
+            network = generate_grid_network(40, 20, seed=seed, broadcasts=40)
+            lines, msts = self.run_simulation(network)
+            self.assertTrue([line for line in lines if line.startswith('node down')])
+            Node.send_current_mst = send_whole_mst
+            self.assertEqual(self.run_simulation(network), (lines, msts))
+            Node.send_current_mst = self.send_current_mst
+
+
+if __name__ == '__main__':
+    unittest.main()
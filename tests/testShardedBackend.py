@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE, run_main, sort_added_links
+from networks import LOW_ENERGY_NETWORK
+
+sys.path.insert(0, CODE)
+from simulation import Simulation
+from logProducer import LogWriter
+import logProducer
+
+
+class HoldingLogWriter(LogWriter):
+    """
+    Log writer of the base station that only writes the logged lines into the file then asked to flush them (see
+    flush_log) or closed. Shard processes write their lines as usual.
+    """
+    base_pid = os.getpid()
+
+    def __init__(self, batch_size=1024):
+        LogWriter.__init__(self, batch_size)
+        self.held = []
+
+    def write(self, line):
+        if self.pid == HoldingLogWriter.base_pid:
+            self.held.append(line)
+        else:
+            LogWriter.write(self, line)
+
+    def flush(self):
+        held, self.held = self.held, []
+        for line in held:
+            LogWriter.write(self, line)
+        LogWriter.flush(self)
+
+    def close(self):
+        self.flush()
+        LogWriter.close(self)
+
+
+class ShardedBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_nodes_below_minimum_budget_die(self):
+        _, event_lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, '--engine', 'events')
+        for options in (('--shards', '2'), ('--shards', '2', '--asynchronous')):
+            returncode, lines = run_main(self.directory, LOW_ENERGY_NETWORK, 60, *options)
+            self.assertEqual(returncode, 0)
+            # Links added within the same level may be logged in any order by the nodes running in threads
+            self.assertEqual(sorted(lines), sorted(event_lines))
+
+    def run_simulation(self, log_name, network=LOW_ENERGY_NETWORK, **options):
+        input_file = os.path.join(self.directory, 'input.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        log_file = os.path.join(self.directory, log_name)
+        Simulation(input_file, log_file=log_file, **options).run()
+        f = open(log_file)
+        lines = f.read().splitlines()
+        f.close()
+        return lines
+
+    def test_base_station_lines_logged_before_shards_lines(self):
+        # Data is sent by the nodes in the shards, everything else is logged by the base station
+        event_lines = self.run_simulation('events.txt', engine='events')
+        logProducer.LogWriter = HoldingLogWriter
+        try:
+            lines = self.run_simulation('shards.txt', shards=2, simulate_broadcasts=True)
+        finally:
+            logProducer.LogWriter = LogWriter
+        self.assertEqual(sort_added_links(lines), sort_added_links(event_lines))
+
+    def test_empty_network(self):
+        self.assertEqual(self.run_simulation('shards.txt', network='50.0\n', shards=2),
+                         self.run_simulation('events.txt', network='50.0\n', engine='events'))
+
+
+if __name__ == '__main__':
+    unittest.main()
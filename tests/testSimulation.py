@@ -0,0 +1,152 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE
+from networks import LOW_ENERGY_NETWORK, RECTANGLE_NETWORK, generate_grid_network
+
+sys.path.insert(0, CODE)
+from simulation import Simulation
+import MST
+
+
+class SimulationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.directory, 'input.txt')
+        f = open(self.input_file, 'w')
+        f.write(LOW_ENERGY_NETWORK)
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_simulation(self, log_name):
+        return Simulation(self.input_file, log_file=os.path.join(self.directory, log_name), engine='events')
+
+    def test_one_simulation_at_a_time(self):
+        first = self.create_simulation('first.txt')
+        first.start()
+        try:
+            self.assertRaises(RuntimeError, self.create_simulation('second.txt').start)
+        finally:
+            first.stop()
+        # Once the first one is stopped, the next one runs as usual
+        nodes = self.create_simulation('second.txt').run()
+        self.assertEqual(sorted(node.node_id for node in nodes), [1, 3, 4])
+
+
+
+def split_network(network, count):
+    """
+    :param network: Contents of the input file
+    :param count: Number of the nodes to keep in the network, the rest of them join it later
+    :return: Contents of the input file with the first nodes only and the rest of the nodes in the form
+            (node ID, (x, y), energy)
+    """
+    lines = [line for line in network.splitlines() if not line.startswith('bcst')]
+    new_nodes = []
+    for line in lines[count + 1:]:
+        node_id, x, y, energy = line[len('node '):].split(',')
+        new_nodes.append((int(node_id), (float(x), float(y)), float(energy)))
+    return '\n'.join(lines[:count + 1]) + '\n', new_nodes
+
+
+class JoinTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def find_tree(self, network, engine, new_nodes=()):
+        """
+        Find MST of the network, let the new nodes join it if any and return the tree.
+        :return: Dictionary mapping node ID to the IDs of its neighbors in MST, in the order the node sends data to them
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        simulation = Simulation(input_file, log_file=os.path.join(self.directory, 'log.txt'), engine=engine,
+                                verify=True)
+        simulation.start()
+        try:
+            simulation.find_MST()
+            if new_nodes:
+                simulation.join(new_nodes)
+        finally:
+            simulation.stop()
+        return dict((node.node_id, list(node.tree_neighbors)) for node in simulation.nodes)
+
+    def test_same_tree_as_found_from_scratch(self):
+        # Networks with equally long links, so the links must be compared the same way the nodes compare them
+        for network, count in ((RECTANGLE_NETWORK, 2), (generate_grid_network(40, 20, seed=1, broadcasts=0), 28)):
+            old_network, new_nodes = split_network(network, count)
+            for engine in ('events', 'fast'):
+                self.assertEqual(self.find_tree(old_network, engine, new_nodes), self.find_tree(network, engine))
+
+    def test_node_without_neighbors(self):
+        old_network, new_nodes = split_network(RECTANGLE_NETWORK, 4)
+        tree = self.find_tree(old_network, 'events', [(5, (50.0, 50.0), 100.0)])
+        self.assertEqual(tree[5], [])
+        self.assertEqual(dict((node_id, neighbors) for node_id, neighbors in tree.items() if node_id != 5),
+                         self.find_tree(old_network, 'events'))
+
+
+class ConcurrentBroadcastsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.broadcast_all = MST.broadcast_all
+        self.sender_counts = []
+
+    def tearDown(self):
+        MST.broadcast_all = self.broadcast_all
+        shutil.rmtree(self.directory)
+
+    def broadcast_all_counted(self, nodes, senders):
+        self.sender_counts.append(len(senders))
+        self.broadcast_all(nodes, senders)
+
+    def run_simulation(self, network, concurrent_broadcasts):
+        """
+        Find MST of the network and let the nodes flood all its broadcasts, repairing MST as the nodes die.
+        :return: The lines logged by every node that sent data, the dead nodes in the order they died and dictionary
+                mapping the ID of every alive node to its energy
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        log_file = os.path.join(self.directory, 'log.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        if os.path.exists(log_file):
+            os.remove(log_file)
+        nodes = Simulation(input_file, log_file=log_file, engine='events', simulate_broadcasts=True,
+                           concurrent_broadcasts=concurrent_broadcasts).run()
+        f = open(log_file)
+        lines = f.read().splitlines()
+        f.close()
+        # Nodes flood the broadcasts performed at the same time in the same order, but the lines of different nodes
+        # may be logged in any order
+        sent = {}
+        for line in lines:
+            if line.startswith('data from'):
+                sent.setdefault(int(line.split()[2]), []).append(line)
+        return (sent, [line for line in lines if line.startswith('node down')],
+                dict((node.node_id, node.energy) for node in nodes))
+
+    def test_same_as_one_at_a_time(self):
+        MST.broadcast_all = self.broadcast_all_counted
+        for seed in range(3):
+            network = generate_grid_network(40, 20, seed=seed, broadcasts=40)
+            sequential = self.run_simulation(network, 1)
+            self.assertTrue(sequential[1])
+            for concurrent_broadcasts in (4, 40):
+                del self.sender_counts[:]
+                self.assertEqual(self.run_simulation(network, concurrent_broadcasts), sequential)
+                self.assertTrue(max(self.sender_counts) > 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
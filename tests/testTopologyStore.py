@@ -0,0 +1,82 @@
+import cPickle
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from runMain import CODE
+from networks import RECTANGLE_NETWORK, generate_grid_network
+
+sys.path.insert(0, CODE)
+from Node import Node
+from simulation import Simulation
+from topologyStore import TopologyStore, TreeView
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TreeViewTest(unittest.TestCase):
+    def test_links_in_mst_kept_in_store(self):
+        positions = {1: (0.0, 0.0), 2: (0.0, 4.0), 3: (5.0, 4.0), 4: (5.0, 0.0)}
+        nodes = [Node(node_id, position, 100.0) for node_id, position in sorted(positions.items())]
+        for node in nodes:
+            for neighbor_id, position in positions.items():
+                if neighbor_id != node.node_id:
+                    node.update_neighbors(neighbor_id, position)
+        nodes[0].index_mst([(1, 2), (1, 4), (2, 3)])
+        TopologyStore().build(nodes)
+
+        tree = nodes[0].tree_neighbors
+        self.assertIsInstance(tree, TreeView)
+        self.assertEqual(list(tree), [2, 4])
+        self.assertTrue(4 in tree)
+        self.assertFalse(3 in tree)
+        # Only the links from the node itself are kept
+        self.assertEqual(nodes[0].get_mst(), [(1, 2), (1, 4)])
+        self.assertFalse(nodes[0].knows_link((2, 3)))
+        self.assertTrue(nodes[0].knows_link((4, 1)))
+
+        nodes[0].store_link((1, 3))
+        self.assertEqual(list(tree), [2, 4, 3])
+        nodes[0].order_tree_links({(1, 2): 2, (1, 3): 1, (1, 4): 0})
+        self.assertEqual(list(tree), [4, 3, 2])
+        self.assertEqual(cPickle.loads(cPickle.dumps(tree, cPickle.HIGHEST_PROTOCOL)), [4, 3, 2])
+        # Rows of the other nodes are not touched
+        self.assertEqual([len(node.tree_neighbors) for node in nodes[1:]], [0, 0, 0])
+
+
+class CompactTopologyTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_simulation(self, network, **options):
+        """
+        Find MST of the network and perform all its broadcasts, repairing MST as the nodes die.
+        :return: Dictionary mapping the ID of every alive node to its energy and the set of its neighbors in MST
+        """
+        input_file = os.path.join(self.directory, 'input.txt')
+        f = open(input_file, 'w')
+        f.write(network)
+        f.close()
+        nodes = Simulation(input_file, log_file=os.path.join(self.directory, 'log.txt'), engine='events',
+                           verify=True, **options).run()
+        return dict((node.node_id, (node.energy, set(node.tree_neighbors))) for node in nodes)
+
+    def test_same_as_without_store(self):
+        stores = [{'compact_topology': True}]
+        if numpy is not None:
+            stores.append({'topology_file': os.path.join(self.directory, 'topology.bin')})
+        for network in (RECTANGLE_NETWORK, generate_grid_network(40, 20, seed=1)):
+            expected = self.run_simulation(network)
+            for options in stores:
+                self.assertEqual(self.run_simulation(network, **options), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()